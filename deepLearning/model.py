@@ -15,22 +15,33 @@ from utils.WordVecs import *
 from architectures import LSTM_Model , BiLSTM_Model, CNN_Model
 from corpus import Corpus
 from tokenizer import Tokenizer
+from vocabulary import Vocabulary
 
 class Model(object):
 
-    def __init__(self):
+    def __init__(self, workers:int=1):
+        # Processes to tokenize tweets. Forking a process that holds a TF session
+        # can hang, so the pool is only used if asked for.
+        self.__workers = workers
         self.__tokenizer = Tokenizer()
+        self.__vocabulary = Vocabulary()
 
-    def __tweet2idx(self, tweet, w2idx):
-        # maps tokens to ids
-        return np.array([w2idx[token] if token in w2idx else w2idx['<UNK>'] for token in tweet])
+    def __tweet2idx(self, tweet, id_map):
+        # maps vocabulary ids of tokens to ids
+        return id_map[np.frombuffer(tweet, dtype=np.int32)]
+
+    def __map_vocabulary(self, w2idx):
+        # maps each vocabulary id to the id of its token in w2idx
+        unk = w2idx['<UNK>']
+        return np.array([w2idx.get(token, unk) for token in self.__vocabulary], dtype=np.int32)
 
     def __convert_format(self, corpus, classes, w2idx, max_len, only_predict:bool=False):
         dataset = []
         for tweet in corpus:
             dataset.append((tweet.get_text(), tweet.get_gold_label()))
         x_data, y_data = zip(*dataset)
-        x_data = [self.__tokenizer.get_only_tokens(tweet) for tweet in x_data]
+        x_data = [self.__vocabulary.get_ids(token for token, tag in tokens) for tokens \
+            in self.__tokenizer.get_tokens_batch(x_data, self.__workers, addit_mode=False)]
         # make it possible to get predictions for unlabeled tweets
         if not only_predict:
             y_data = [classes[label] for label in y_data]
@@ -40,7 +51,8 @@ class Model(object):
         else:
             y_data = None
         # to np array
-        x_data = np.array([self.__tweet2idx(tweet, w2idx) for tweet in x_data])     
+        id_map = self.__map_vocabulary(w2idx)
+        x_data = np.array([self.__tweet2idx(tweet, id_map) for tweet in x_data])
         # padding
         x_data = pad_sequences(x_data, max_len)
         return x_data, y_data
@@ -0,0 +1,64 @@
+"""
+Tests of the Featurer (mcPerceptron/featurer.py): features of a corpus must
+not depend on the number of workers, and features loaded from the feature store
+must be the same as freshly extracted ones. Run with pytest or as a script from
+the root folder of the repository.
+"""
+
+import os
+import sys
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcPerceptron'))
+
+from corpus import Corpus
+from featurer import Featurer
+from tokenizer_test import generate_tweets
+
+labels = ['joy', 'anger', 'fear', 'surprise', 'disgust', 'sad']
+parameters = {'score': 'frequency', 'ngrams': (1,2,3,4), 'count pos': False,
+    'print progressbar': False}
+
+
+def write_corpus(directory, number=300):
+    """ Writes generated tweets with labels to a corpus file in directory. """
+    filename = os.path.join(directory, 'corpus.csv')
+    with open(filename, 'w') as w:
+        for i, tweet in enumerate(generate_tweets(number)):
+            w.write('{}\t{}\n'.format(labels[i % len(labels)], tweet.replace('\t', ' ')))
+    return filename
+
+
+def extract(filename, **options):
+    """ Returns the features of each tweet and all feature names. """
+    corpus = Corpus(filename)
+    Featurer(corpus, dict(parameters, **options), {})
+    return [tweet.get_features() for tweet in corpus], corpus.get_all_feature_names()
+
+
+def test_workers():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        for options in ({}, {'score': 'tf_idf', 'ngrams': (1,)}, {'hash bits': 12}):
+            assert extract(filename, **options) == extract(filename, workers=2, **options), \
+                'Different features with 2 workers for {}'.format(options)
+
+
+def test_feature_store():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        store = os.path.join(directory, 'store')
+        for options in ({}, {'score': 'tf_idf', 'ngrams': (1,)}, {'hash bits': 12}):
+            fresh = extract(filename, **options)
+            assert extract(filename, **{'feature store': store}, **options) == fresh
+            # Nothing is counted if the features are in the store
+            with patch.object(Featurer, 'count_batch', side_effect=AssertionError('Not stored')):
+                assert extract(filename, **{'feature store': store}, **options) == fresh, \
+                    'Different stored features for {}'.format(options)
+
+
+if __name__ == '__main__':
+    test_workers()
+    test_feature_store()
+    print('Features are the same for any number of workers and from the store.')
@@ -1,10 +1,14 @@
+import os
 import sys
+from tempfile import TemporaryDirectory
 from time import time
 
 sys.path.append('../')
 
 from corpus import Corpus
-from featurer import Featurer
+from evaluator.scorer import Scorer
+from featurer import Featurer, idf_filename
+from model_file import ModelFile
 from tweet import Tweet
 from mc_perceptron import mcPerceptron
 
@@ -25,6 +29,8 @@ class Experiment(object):
                     'train and test': self.train_and_test,
                     'test': self.test,
                     'test demo': self.test_demo,
+                    'convert model': self.convert_model,
+                    'quantize model': self.quantize_model,
                     }
         experiment_parameters = {
                     'train data': '../data/train-v3.csv',
@@ -34,6 +40,19 @@ class Experiment(object):
                     'ngrams': (1,2,3),
                     'score': 'frequency',
                     'count pos': False,
+                    'hash bits': None,  # e.g. 20 to hash features into 2^20 indices
+                    'workers': None,  # processes for feature extraction
+                    'feature store': None,  # directory to cache features
+                    'min df': None,  # prune features of less train tweets
+                    'max features': None,  # keep only the most frequent features
+                    'max ngram features': None,  # the same per order, e.g. {3: 50000}
+                    'weight matrix': False,  # perceptron weights as numpy matrix
+                    'model format': 'json',  # or 'binary', see model_file.py
+                    'sparse weights': False,  # only store weights that are not 0
+                    'quantization': None,  # 'float16' or 'int8' for binary models
+                    'train workers': None,  # processes for training, needs weight matrix
+                    'mixing': 'uniform',  # or 'mistakes', to mix the weights of workers
+                    'seed': 0,  # shuffles shards and tweets of parallel training
                     'load model': 'freq_123g_35e',
                     #'load model': 'dummy_model',
                     'save model': 'freq_123g_35e',
@@ -107,18 +126,26 @@ class Experiment(object):
         # Extract features
         print('\nExtracting features from TRAIN data:')
         features_train = Featurer(train_corpus, self.parameters, self.token_options)
-        print('Extracting features from TEST data:')
-        features_test = Featurer(test_corpus, self.parameters, self.token_options)
-
-        print('Training and testing model...\n')
+        self.print_pruning_report(features_train)
 
         model = mcPerceptron(
                     self.classes, \
                     self.parameters, \
                     self.token_options, \
-                    train_corpus.get_all_feature_names()
+                    train_corpus.get_all_feature_names(), \
+                    features_train.feature_idf_scores
                     )
-        model.train_and_test(train_corpus, test_corpus)
+
+        print('Extracting features from TEST data:')
+        # Test features use the idf scores of the train data (if tf_idf), and
+        # only features of the model with a weight matrix (transform mode)
+        features_test = Featurer(test_corpus, self.test_parameters(), self.token_options,
+            features_train.feature_idf_scores, model.feature_index)
+
+        print('Training and testing model...\n')
+
+        model.train_and_test(train_corpus, test_corpus, features_test.feature_matrix)
+        self.save_idf_scores(features_train)
 
         print('\nFinalized prediction and evaluation.')
 
@@ -150,6 +177,7 @@ class Experiment(object):
         # Extract features
         print('\nExtracting features from TRAIN data:')
         features_train = Featurer(train_corpus, self.parameters, self.token_options)
+        self.print_pruning_report(features_train)
 
         print('\nTraining model...\n')
 
@@ -157,9 +185,11 @@ class Experiment(object):
                     self.classes, \
                     self.parameters, \
                     self.token_options, \
-                    train_corpus.get_all_feature_names()
+                    train_corpus.get_all_feature_names(), \
+                    features_train.feature_idf_scores
                     )
         model.train(train_corpus)
+        self.save_idf_scores(features_train)
 
         print('\nTraining model completed.')
 
@@ -181,16 +211,21 @@ class Experiment(object):
             '{}:\t{}'.format(o,v) for o,v in zip(self.token_options.keys(), \
             self.token_options.values())])))
 
-        print('\nExtracting features from TEST data:')
-        features_test = Featurer(test_corpus, self.parameters, self.token_options)
-
         model = mcPerceptron(
                     self.classes, \
                     self.parameters, \
                     self.token_options
                     )
-        print('\nLoading model from file [{}].\n'.format(self.parameters['load model']))
-        model.test_model(test_corpus)
+        print('\nLoading model from file [{}].'.format(self.parameters['load model']))
+        model.load_model()
+        self.use_model_options(model)
+
+        # Only features of the model are extracted
+        print('\nExtracting features from TEST data:')
+        features_test = Featurer(test_corpus, self.test_parameters(), self.token_options,
+            self.load_idf_scores(model), model.feature_index)
+
+        model.test_model(test_corpus, features_test.feature_matrix)
 
         print('\nModel evaluation completed.')
 
@@ -210,16 +245,120 @@ class Experiment(object):
                     self.token_options
                     )
         self.model.load_model()
+        self.use_model_options(self.model)
+        # One featurer (and tokenizer) serves all demo requests
+        # Without a corpus, idf scores can't be fitted
+        idf_scores = self.load_idf_scores(self.model,
+            missing='tf_idf features are frequencies without idf')
+        self.featurer = Featurer(None, self.test_parameters(), self.token_options,
+            idf_scores, self.model.feature_index)
 
 
     def predict(self, text):
         tweet = Tweet(text)
-        featurer = Featurer(None, self.parameters, self.token_options)
-        features = featurer.extract_features(tweet)
+        features = self.featurer.extract_features(tweet)
         emotion = self.model._predict(features, tweet)
         return emotion[0][0]
 
 
+    def test_parameters(self):
+        # Features are pruned by their frequency in the train data only,
+        # the model ignores test features without weights anyway
+        parameters = self.parameters.copy()
+        for p in ('min df', 'max features', 'max ngram features'):
+            parameters[p] = None
+        # With a weight matrix, test tweets are predicted as one matrix
+        parameters['feature matrix'] = self.parameters.get('weight matrix', False)
+        return parameters
+
+
+    def print_pruning_report(self, featurer):
+        if featurer.prune:
+            print('\nPruning report (with other thresholds as given):')
+            print(' min df\tfeatures\tweights (MiB)\tsaved (MiB)')
+            for min_df, size, memory, saved in featurer.pruning_report(num_classes=len(self.classes)):
+                print(' {}\t{}\t\t{:.1f}\t\t{:.1f}'.format(min_df, size, memory, saved))
+
+
+    def convert_model(self):
+        # Convert a json model ('load model') to the binary format ('save model')
+        model = self.load_model_file()
+        if self.parameters.get('quantization'):
+            model = model.quantize(self.parameters['quantization'])
+        model.save(self.parameters['save model'])
+        print('Model [{}] converted to [{}].'.format(self.parameters['load model'],
+            self.parameters['save model']))
+
+
+    def quantize_model(self):
+        # Report size and F-macro on the test data of the model ('load model')
+        # and its quantized versions, save the one of 'quantization' as
+        # binary model ('save model')
+        model_file = self.load_model_file()
+        self.token_options = model_file.token_options
+        self.parameters = dict(self.parameters, **model_file.config)
+        test_corpus = Corpus(self.parameters['test data'])
+        print('\nExtracting features from TEST data:')
+        parameters = dict(self.test_parameters(), **{'feature matrix': True})
+        features = Featurer(test_corpus, parameters, self.token_options,
+            model_file.get_idf_scores(), model_file.get_feature_index()).feature_matrix
+        model = mcPerceptron(self.classes, dict(self.parameters, **{'weight matrix': True}),
+            self.token_options)
+
+        print('\nWeights\tSize (MiB)\tFmac')
+        with TemporaryDirectory() as directory:
+            for quantization in ('float32', 'float16', 'int8'):
+                quantized = model_file.quantize(quantization)
+                filename = os.path.join(directory, quantization)
+                quantized.save(filename)
+                model.load_model(filename)
+                model.test(test_corpus, test_features=features)
+                print('{}\t{:.2f}\t\t{:.3f}'.format(quantization,
+                    os.path.getsize(filename) / 1024**2, Scorer(test_corpus).f_macro))
+                if quantization == self.parameters.get('quantization'):
+                    quantized.save(self.parameters['save model'])
+                    print('Model saved as {}'.format(self.parameters['save model']))
+
+
+    def load_model_file(self):
+        # The model of 'load model' as ModelFile, also if it was saved as json
+        filename = self.parameters['load model']
+        if ModelFile.is_model_file(filename):
+            return ModelFile.load(filename)
+        config = {p:self.parameters.get(p) for p in ('ngrams', 'score', 'count pos', 'hash bits')}
+        return ModelFile.from_json(filename, self.classes, self.token_options, config,
+            self.load_idf_scores(missing='the model has no idf scores'))
+
+
+    def use_model_options(self, model):
+        # Models in the binary format know their token options and config
+        if ModelFile.is_model_file(self.parameters['load model']):
+            self.token_options = model.token_options
+            self.parameters = dict(self.parameters, **model.config)
+
+
+    def save_idf_scores(self, featurer):
+        # Store idf scores of the train data with the model (binary models
+        # include them)
+        if self.parameters['save model'] and self.parameters['score'] == 'tf_idf' \
+                and self.parameters.get('model format') != 'binary':
+            featurer.save_idf_scores(idf_filename(self.parameters['save model']))
+
+
+    def load_idf_scores(self, model=None, missing:str='idf scores are fitted on the test data'):
+        # missing tells what happens without saved idf scores
+        if model and model.idf_scores is not None:
+            return model.idf_scores
+        if self.parameters['score'] == 'tf_idf':
+            filename = idf_filename(self.parameters['load model'])
+            if os.path.isfile(filename):
+                return Featurer.load_idf_scores(filename)
+            # Models saved before idf scores were stored with them
+            print('\nNo idf scores saved with the model ({} not found), {}.'
+                .format(filename, missing))
+        return None
+
+
     def print_intro(self):
         # Print info about parameters
         print('Starting BrainT with parameters:\n{}'.format('\n'.join([' ' \
@@ -0,0 +1,119 @@
+import json
+from array import array
+
+import numpy as np
+from scipy.sparse import csr_matrix, save_npz, load_npz
+
+
+class FeatureMatrix(object):
+    """
+    :FeatureMatrix:
+
+    Features of a whole corpus as one sparse matrix, with one row per tweet
+    and one column per feature. Compared to a dict of features per Tweet, this
+    takes an order of magnitude less memory and allows vectorized math.
+
+    :Attributes:
+        - matrix -- scipy.sparse.csr_matrix, float32 values, int32 indices
+        - feature_names -- list of feature names, one per column (None for
+            hashed features, where columns are the hash indices)
+        - labels -- numpy array (int32) with the gold label of each row, as
+            index in label_names (-1 if the tweet has no gold label)
+        - label_names -- sorted list of all gold labels
+
+    :Usage:
+        features = FeatureMatrix.load(filename)
+        features.save(filename)   -  writes filename.npz and filename.json
+    """
+
+    def __init__(self, matrix:csr_matrix, feature_names:list, labels,
+            label_names:list):
+        self.matrix = matrix
+        self.feature_names = feature_names
+        self.labels = labels
+        self.label_names = label_names
+
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+
+    def get_feature_index(self):
+        """ Returns a dict that maps feature names to column indices. """
+        return {f:i for i, f in enumerate(self.feature_names)}
+
+
+    def get_features(self, i:int):
+        """ Returns the features of row i as dict, like Tweet.get_features(). """
+        row = self.matrix.getrow(i)
+        names = self.feature_names
+        if names is None:
+            return dict(zip(row.indices.tolist(), row.data.tolist()))
+        return {names[j]:value for j, value in zip(row.indices.tolist(), row.data.tolist())}
+
+
+    def save(self, filename:str):
+        """ Saves the matrix with save_npz, feature and label names as json. """
+        save_npz(filename + '.npz', self.matrix)
+        with open(filename + '.json', 'w') as w:
+            json.dump({
+                'feature names': self.feature_names,
+                'label names': self.label_names,
+                'labels': self.labels.tolist()
+                }, w)
+
+
+    @classmethod
+    def load(cls, filename:str):
+        """ Loads a FeatureMatrix saved by save(). """
+        matrix = load_npz(filename + '.npz')
+        with open(filename + '.json', 'r') as f:
+            info = json.load(f)
+        return cls(matrix, info['feature names'],
+            np.array(info['labels'], dtype=np.int32), info['label names'])
+
+
+class FeatureMatrixBuilder(object):
+    """
+    Builds a FeatureMatrix row by row, from dicts of features. Columns are
+    given to new feature names in order of first appearance. If num_columns
+    is given, features are expected to be column indices already (hash mode).
+    """
+
+    def __init__(self, num_columns:int=None):
+        self.num_columns = num_columns
+        self.feature_index = None if num_columns else {}
+        self.labels = []
+        self.indptr = array('i', [0])
+        self.indices = array('i')
+        self.data = array('f')
+
+
+    def add_row(self, features:dict, label:str=None):
+        if self.feature_index is None:
+            self.indices.extend(features)
+        else:
+            index = self.feature_index
+            self.indices.extend([index.setdefault(f, len(index)) for f in features])
+        self.data.extend(features.values())
+        self.indptr.append(len(self.indices))
+        self.labels.append(label)
+
+
+    def build(self):
+        """ Returns the FeatureMatrix of all rows added so far. """
+        if self.feature_index is None:
+            feature_names = None
+            num_columns = self.num_columns
+        else:
+            feature_names = list(self.feature_index)
+            num_columns = len(feature_names)
+        matrix = csr_matrix((np.frombuffer(self.data, dtype=np.float32),
+            np.frombuffer(self.indices, dtype=np.int32),
+            np.frombuffer(self.indptr, dtype=np.int32)),
+            shape=(len(self.labels), num_columns), copy=True)
+        label_names = sorted({label for label in self.labels if label is not None})
+        label_ids = {label:i for i, label in enumerate(label_names)}
+        labels = np.array([label_ids.get(label, -1) for label in self.labels],
+            dtype=np.int32)
+        return FeatureMatrix(matrix, feature_names, labels, label_names)
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+from hashlib import sha1
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from feature_matrix import FeatureMatrix
+
+
+class FeatureStore(object):
+    """
+    :FeatureStore:
+
+    An on-disk cache of extracted features. Each entry is a FeatureMatrix (of
+    feature counts) plus the number of tokens of each tweet, stored under a
+    key made of the content of the corpus and the featurization config.
+
+    Arrays are stored as .npy files and loaded memory-mapped, so loading an
+    entry takes about as long as reading the feature names. If the store
+    grows larger than max_size (bytes), least recently used entries are
+    removed.
+
+    :Usage:
+        store = FeatureStore(directory)
+        key = store.key(corpus, config)
+        entry = store.load(key)   -  (FeatureMatrix, lengths) or None
+        store.save(key, feature_matrix, lengths)
+    """
+
+    def __init__(self, directory:str, max_size:int=2*1024**3):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+
+    def key(self, corpus, config:dict):
+        """
+        Returns the key of a corpus (hash of its texts and gold labels) and a
+        featurization config (dict of json values).
+        """
+        h = sha1()
+        for tweet in corpus:
+            h.update('{}\t{}\n'.format(tweet.get_gold_label(), tweet.get_text()).encode('utf-8'))
+        h.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+
+    def load(self, key:str):
+        """ Returns the (FeatureMatrix, lengths) of key, or None if not stored. """
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        # Mark entry as recently used
+        os.utime(path)
+        arrays = {name:np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+            for name in ('data', 'indices', 'indptr', 'lengths', 'labels')}
+        with open(os.path.join(path, 'info.json'), 'r') as f:
+            info = json.load(f)
+        matrix = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(info['shape']), copy=False)
+        features = FeatureMatrix(matrix, info['feature names'], arrays['labels'],
+            info['label names'])
+        return features, arrays['lengths']
+
+
+    def save(self, key:str, features:FeatureMatrix, lengths):
+        """ Stores the FeatureMatrix and lengths (ints) under key. """
+        path = os.path.join(self.directory, key)
+        # Write to a temporary folder first, so that entries are complete
+        tmp = path + '.tmp{}'.format(os.getpid())
+        os.makedirs(tmp, exist_ok=True)
+        matrix = features.matrix
+        arrays = {'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr,
+            'lengths': np.array(lengths, dtype=np.int32), 'labels': features.labels}
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp, name + '.npy'), values)
+        with open(os.path.join(tmp, 'info.json'), 'w') as w:
+            json.dump({
+                'shape': list(matrix.shape),
+                'feature names': features.feature_names,
+                'label names': features.label_names
+                }, w)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp, path)
+        self.evict()
+
+
+    def evict(self):
+        """ Removes least recently used entries until the store fits max_size. """
+        entries = []
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            if os.path.isdir(path) and '.tmp' not in key:
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+        total = sum(size for _, size, _ in entries)
+        # The most recent entry is kept in any case
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path)
+            total -= size
@@ -1,14 +1,33 @@
+import os
 import sys
+from hashlib import sha1
 from math import log10
-from nltk import pos_tag
+from multiprocessing import Pool
+from zlib import crc32
+import numpy as np
 
 sys.path.append('../')
 
 from tokenizer import Tokenizer
 from corpus import Corpus
+from tweet import Tweet
+from feature_matrix import FeatureMatrixBuilder
+from feature_store import FeatureStore
+from ngrams import NgramExtractor
+from pos_tagger import PosTagger
 from utils.progress_bar import print_progressbar
 
 
+def hash_feature(feature:str, bits:int):
+    """
+    Maps a feature name to an index in [0, 2^bits) and a sign (1 or -1). The
+    hash (crc32) is stable, so features get the same index in each run. Signs
+    let colliding features cancel out on average, instead of adding up.
+    """
+    h = crc32(feature.encode('utf-8'))
+    return h & ((1 << bits) - 1), -1 if h >> 31 else 1
+
+
 class Featurer():
     """
     :Featurer:
@@ -30,12 +49,37 @@ class Featurer():
             -- count
             -- frequency
             -- tf_idf
+        - hash bits -- (optional) if given, features are hashed into 2^bits
+            indices (ints) instead of feature names, see hash_feature
+        - feature matrix -- (optional) if True, features of the corpus are
+            stored as one sparse matrix instead of a dict per Tweet
+        - idf_scores -- (optional) idf scores fitted on the train corpus, for
+            tf_idf. If not given, they are fitted on the corpus itself
+        - feature_index -- (optional) features of a trained model --> index,
+            see mcPerceptron.load_model. If given, the Featurer is in transform
+            mode: features that are not in the index are dropped, and the
+            known features are given as indices (ints)
+        - workers -- (optional) number of processes that count features in
+            parallel. Features are the same for any number of workers
+        - feature store -- (optional) directory where feature counts are cached
+            per corpus and config, see feature_store.py
+        - min df -- (optional) features that occur in less tweets are pruned
+        - max features -- (optional) only this many features with the highest
+            document frequency are kept
+        - max ngram features -- (optional) the same per n-gram order, dict,
+            e.g. {3: 50000, 4: 20000}. POS tags count as unigrams
+        Pruning is done after counting the corpus, so the pruned features never
+        get weights in the perceptron. See select_features and pruning_report.
 
     :Output:
     Directly fed back into the corpus and its tweet objects. See the following
     methods to access the features:
         - corpus.get_all_features() -- list of all feature labels in corpus
         - tweet.get_features() -- dict of features and values for each tweet
+    In hash and transform mode, features are indices and no feature labels
+    are collected.
+    In matrix mode, features are not sent to the tweets, but stored in
+        - featurer.feature_matrix -- a FeatureMatrix (see feature_matrix.py)
 
     :Usage:
         f = Featurer(corpus, PARAMETERS)
@@ -44,7 +88,8 @@ class Featurer():
 
     """
 
-    def __init__(self, corpus:Corpus, parameters:dict, token_options:dict):
+    def __init__(self, corpus:Corpus, parameters:dict, token_options:dict,
+            idf_scores:dict=None, feature_index:dict=None):
 
         """
         corp=None, \
@@ -73,211 +118,437 @@ class Featurer():
         self.corpus = corpus
         self.corpus_size = corpus.length() if corpus else 0
         self.token_options = token_options
+        self.tokenizer = Tokenizer()  # shared by all tweets
         self.score = parameters['score']
         self.ngrams = parameters['ngrams']
         self.count_pos = parameters['count pos']
         self.feature_labels = {'<BIAS>'}
         self.print_progressbar = parameters['print progressbar']
+        self.parameters = parameters
+        self.workers = parameters.get('workers')
+        self.shard_size = 500  # tweets per task of a worker
+        store = parameters.get('feature store')
+        self.store = FeatureStore(store) if store else None
+        # POS tags are cached next to the feature store
+        self.pos_tagger = None
+        if self.count_pos:
+            self.pos_tagger = PosTagger(os.path.join(store, 'pos_tags.json') if store else None)
+        self.hash_bits = parameters.get('hash bits')
+        self.min_df = parameters.get('min df')
+        self.max_features = parameters.get('max features')
+        self.max_ngram_features = parameters.get('max ngram features')
+        self.prune = bool(self.min_df or self.max_features or self.max_ngram_features)
+        self.document_frequencies = None  # kept for pruning_report
+        self.matrix_mode = parameters.get('feature matrix', False)
+        self.feature_matrix = None
+        self.feature_index = feature_index
+        # Number of columns of features that are indices
+        self.num_indices = 2 ** self.hash_bits if self.hash_bits else \
+            len(feature_index) if feature_index else None
+        # Fitted on the train corpus, if given (see save_idf_scores)
+        self.feature_idf_scores = idf_scores
+        if feature_index and idf_scores:
+            self.feature_idf_scores = {feature_index[f]:idf for f, idf in idf_scores.items()
+                if f in feature_index}
+        # Extractors of multi-grams, see ngrams.py
+        self.ngram_extractors = {
+            2: [NgramExtractor('xx', pad=True)],
+            3: [NgramExtractor('xxx', pad=True)],
+            # Tetragrams with skip points: 2nd or 3rd token is skipped
+            4: [NgramExtractor('x_xx'), NgramExtractor('xx_x')],
+            }
+        assert not self.hash_bits or 0 < self.hash_bits <= 31, \
+            'Invalid hash bits ({}), expecting 1 to 31'.format(self.hash_bits)
+        assert not (self.hash_bits and self.prune), \
+            'Features can not be pruned in hash mode'
+        assert not (self.hash_bits and feature_index), \
+            'Hashed features need no feature index'
         if corpus:
             self.extract()
 
 
     def extract(self):
         """
-        Main routine the performs some basic calculations before feature vectors
-        are extracted:
-        (1) counts collection size,
-        (2) extracts list of all terms from colection (a.k.a. "feature names")
-
-        Extract features for each tweet and send to corresponding Tweet object.
-        If no or invalid type is given as parameter, print a soft warning.
+        Main routine, extracts features from the corpus in one sweep:
+        (1) tokenizes each tweet once and counts its features (all n-grams and
+            POS tags), which also gives the list of all feature names,
+        (2) counts document frequencies of the features if we want tf-idf scores
+            and no idf scores are given, or if features are pruned
+
+        Feature values are calculated from the counts and sent to the
+        corresponding Tweet object, or to the feature matrix in matrix mode.
+        If idf scores are fitted on this corpus or features are pruned, this
+        has to wait until the sweep is completed.
         """
 
-        # Calculate inverted document frequency if we want tf-idf scores
-        if self.score == 'tf_idf':
-            self.calculate_idf_scores() # TODO: add tt here?
-
-        # Main job: extract features and print progressbar
+        document_frequencies = {}
+        counted = []  # (tweet, feature counts, number of tokens)
+        # Fit idf scores on this corpus, unless they are given
+        fit_idf = self.score == 'tf_idf' and self.feature_idf_scores is None
+        count_df = fit_idf or self.prune
+        if self.matrix_mode:
+            builder = FeatureMatrixBuilder(self.num_indices)
+            output = lambda tweet, features: builder.add_row(features, tweet.get_gold_label())
+        else:
+            output = lambda tweet, features: tweet.set_features(features)
+
+        # Main job: count features and print progressbar
         if self.print_progressbar:
             progress = 1
             print_progressbar(progress, self.corpus_size)
-        for tweet in self.corpus:
-            features = self.extract_features(tweet)
-            tweet.set_features(features)
+        for tweet, features, length in self.__count_corpus():
+            # Count document frequency of each feature
+            if count_df:
+                for f in features:
+                    document_frequencies[f] = document_frequencies.get(f,0)+1
+                counted.append((tweet, features, length))
+            else:
+                output(tweet, self.weight_features(features, length))
             if self.print_progressbar:
                 print_progressbar(progress, self.corpus_size)
                 progress += 1
 
+        # Drop pruned features, before their weights are calculated
+        if self.prune:
+            kept = self.select_features(document_frequencies)
+            self.document_frequencies = document_frequencies
+            document_frequencies = kept
+            self.feature_labels = set(kept) | {'<BIAS>'}
+            counted = [(tweet, {f:value for f, value in features.items() if f in kept}, length)
+                for tweet, features, length in counted]
+
+        # Calculate inverted document frequency if we want tf-idf scores
+        if fit_idf:
+            self.calculate_idf_scores(document_frequencies)
+        if count_df:
+            for tweet, features, length in counted:
+                output(tweet, self.weight_features(features, length))
+
+        if self.matrix_mode:
+            self.feature_matrix = builder.build()
+        if self.pos_tagger:
+            self.pos_tagger.save()
+
         # Add feature labels to corpus
         self.corpus.set_all_feature_names(self.feature_labels)
 
 
+    def __count_corpus(self):
+        """
+        Yields (tweet, feature counts, number of tokens) for each tweet of the
+        corpus, in order of the corpus. With a feature store, counts are loaded
+        from the store if the corpus was counted with the same config before,
+        or else stored for later runs.
+        """
+        if not self.store:
+            yield from self.__count_tweets()
+            return
+
+        config = {'token options': self.token_options, 'ngrams': list(self.ngrams),
+            'score': self.score, 'count pos': self.count_pos, 'hash bits': self.hash_bits}
+        if self.feature_index:
+            config['feature index'] = sha1('\n'.join(self.feature_index).encode('utf-8')).hexdigest()
+        key = self.store.key(self.corpus, config)
+        stored = self.store.load(key)
+        if stored:
+            features, lengths = stored
+            matrix = features.matrix
+            names = features.feature_names
+            indptr = matrix.indptr.tolist()
+            for i, tweet in enumerate(self.corpus):
+                start, end = indptr[i], indptr[i+1]
+                columns = matrix.indices[start:end].tolist()
+                counts = [int(count) for count in matrix.data[start:end].tolist()]
+                if names is not None:
+                    columns = [names[j] for j in columns]
+                    self.feature_labels.update(columns)
+                yield tweet, dict(zip(columns, counts)), int(lengths[i])
+            return
+
+        builder = FeatureMatrixBuilder(self.num_indices)
+        lengths = []
+        for tweet, features, length in self.__count_tweets():
+            builder.add_row(features, tweet.get_gold_label())
+            lengths.append(length)
+            yield tweet, features, length
+        self.store.save(key, builder.build(), lengths)
+
+
+    def __count_tweets(self):
+        """
+        Like __count_corpus, without the store. With several workers, the
+        corpus is split into shards of consecutive tweets, which are counted in
+        worker processes. Shards are merged in order, so features (and the
+        order of new feature names) are the same for any number of workers.
+        Shards are counted with count_batch in any case, see there.
+        """
+        if not self.workers or self.workers == 1:
+            tweets = list(self.corpus)
+            for i in range(0, len(tweets), self.shard_size):
+                shard = tweets[i:i+self.shard_size]
+                for tweet, counted in zip(shard, self.count_batch(shard)):
+                    yield (tweet,) + counted
+            return
+
+        texts = [tweet.get_text() for tweet in self.corpus]
+        shards = [texts[i:i+self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        tweets = iter(self.corpus)
+        with Pool(self.workers, _init_worker, (self.parameters, self.token_options,
+                self.feature_index)) as pool:
+            for counted, pos_tags in pool.imap(_count_shard, shards):
+                if self.pos_tagger:
+                    self.pos_tagger.update(pos_tags)
+                for features, length in counted:
+                    if not self.num_indices:
+                        self.feature_labels.update(features)
+                    yield next(tweets), features, length
+
+
     def extract_features(self, tweet):
+        return self.weight_features(*self.count_features(tweet))
 
-        features = {}
-        tokens = Tokenizer().get_tokens(tweet.get_text(), **self.token_options)
 
-        # Extract unigrams
-        if 1 in self.ngrams:
-            for token in tokens:
-                unigram = token[0]
-                features[unigram]=1 if self.score=='binary' else features.get(unigram,0)+1
-                self.feature_labels.add(unigram)
+    def count_features(self, tweet):
+        """
+        Tokenizes the tweet once and counts its features.
 
-        # If we need to extract multi-grams
-        if any([True if ngram in (2,3,4) else False for ngram in self.ngrams]):
-            # Get "strict" tokens, i.e. without replacing anything
+        Returns:
+            a tuple of the dict of feature counts and the number of tokens
+        """
+        return self.count_batch([tweet])[0]
+
+
+    def count_batch(self, tweets):
+        """
+        Like count_features for a list of tweets, returns a list of tuples.
+        POS tags of all tweets are tagged at once (see pos_tagger.py).
+        """
+        counted = [self.__count_tokens(tweet) for tweet in tweets]
+
+        # Extract POS
+        if self.count_pos:
+            tags = self.pos_tagger.tag_batch([tokens for features, tokens in counted])
+            for (features, tokens), tweet_tags in zip(counted, tags):
+                for tag in tweet_tags:
+                    tag = '<' + tag + '>'
+                    features[tag]=1 if self.score=='binary' else features.get(tag,0)+1
+
+        return [self.__map_features(features, len(tokens)) for features, tokens in counted]
+
+
+    def __count_tokens(self, tweet):
+        """
+        Tokenizes the tweet once and counts its n-grams. Returns a tuple of the
+        dict of feature counts and the tokens (strings).
+        """
+
+        features = {}
+        # Tokens with the user options, plus "strict" tokens if we need to
+        # extract multi-grams, i.e. without replacing anything. Both are
+        # derived from one scan of the tweet
+        variants = [self.token_options]
+        multigrams = any([True if ngram in (2,3,4) else False for ngram in self.ngrams])
+        if multigrams:
             tp = self.token_options.copy()
             tp['stem'] = False
             tp['replace_emojis'] = False
             tp['replace_num'] = False
             tp['addit_mode'] = False
-            strict_tokens = Tokenizer().get_tokens(tweet.get_text(), **tp)
-
-            # Extract bigrams
-            if 2 in self.ngrams:
-                bigrams = self.get_bigrams(strict_tokens)
-                features.update(bigrams)
-            # Extract trigrams
-            if 3 in self.ngrams:
-                trigrams = self.get_trigrams(strict_tokens)
-                features.update(trigrams)
-            # Extract skip-one-tetragrams
-            if 4 in self.ngrams:
-                tetragrams = self.get_tetragrams(strict_tokens)
-                features.update(tetragrams)
+            variants.append(tp)
+        token_lists = self.tokenizer.get_token_variants(tweet.get_text(), variants)
+        tokens = [token for token, tag in token_lists[0]]
 
-        # Extract POS
-        if self.count_pos:
-            plain_tokens = [t[0] for t in tokens]
-            tokens_with_pos = pos_tag(plain_tokens)
-            for token in tokens_with_pos:
-                tag = '<' + token[1] + '>'
-                features[tag]=1 if self.score=='binary' else features.get(tag,0)+1
-                self.feature_labels.add(tag)
+        # Extract unigrams
+        if 1 in self.ngrams:
+            for token in tokens:
+                features[token]=1 if self.score=='binary' else features.get(token,0)+1
+
+        # If we need to extract multi-grams
+        if multigrams:
+            strict_tokens = [token for token, tag in token_lists[1]]
+            binary = True if self.score == 'binary' else False
+            # Extract bigrams, trigrams and skip-one-tetragrams
+            for n in (2, 3, 4):
+                if n in self.ngrams:
+                    for extractor in self.ngram_extractors[n]:
+                        features.update(extractor.count(strict_tokens, binary))
+
+        return features, tokens
+
+
+    def __map_features(self, features, length):
+        """
+        Maps features into the fixed index space of hash mode, or to the indices
+        of the known features in transform mode, or else adds them to the
+        feature labels. Returns a tuple of features and length.
+        """
+        if self.feature_index:
+            index = self.feature_index
+            return {index[f]:value for f, value in features.items() if f in index}, length
+
+        if self.hash_bits:
+            hashed = {}
+            for f, value in features.items():
+                index, sign = hash_feature(f, self.hash_bits)
+                hashed[index] = hashed.get(index,0) + sign * value
+            return hashed, length
+
+        self.feature_labels.update(features)
+        return features, length
+
+
+    def weight_features(self, features, length):
+        """
+        Calculates feature values from the counts of count_features (in place)
+        and adds the '<BIAS>' feature.
+        """
 
         # Get frequency from counts
         if self.score == 'frequency' or self.score == 'tf_idf':
             for f in features:
-                features[f] /= len(tokens)
+                features[f] /= length
 
-        # Get tf-idf from counts
-        if self.score == 'tf_idf':
+        # Get tf-idf from counts (features unseen in the fitted corpus keep
+        # their frequency, all features do if there is no corpus to fit on)
+        if self.score == 'tf_idf' and self.feature_idf_scores:
             for f in features:
-                if self.feature_idf_scores[f]:
-                    features[f] *= self.feature_idf_scores[f]
-
-        features['<BIAS>'] = 1
+                idf = self.feature_idf_scores.get(f)
+                if idf:
+                    features[f] *= idf
+
+        if self.hash_bits:
+            index, sign = hash_feature('<BIAS>', self.hash_bits)
+            features[index] = features.get(index,0) + sign
+        elif self.feature_index:
+            features[self.feature_index['<BIAS>']] = 1
+        else:
+            features['<BIAS>'] = 1
 
         return features
 
 
-    def get_bigrams(self, tokens):
-        binary = True if self.score == 'binary' else False
-        bigrams = {}
-        prev = '<BEGIN>'  # Previous token
-        for token in tokens:
-            bigram = ' '.join([prev, token[0]])
-            prev = token[0]
-            bigrams[bigram] = 1 if binary else bigrams.get(bigram,0)+1
-            self.feature_labels.add(bigram)
-        bigram = ' '.join([prev, '<END>'])
-        bigrams[bigram] = 1 if binary else bigrams.get(bigram,0)+1
-        self.feature_labels.add(bigram)
-        return bigrams
-
-
-    def get_trigrams(self, tokens):
-        binary = True if self.score == 'binary' else False
-        trigrams = {}
-        prev = '<BEGIN>'
-        prev_prev = None
-        for token in tokens:
-            if prev_prev:
-                trigram = ' '.join([prev_prev, prev, token[0]])
-                trigrams[trigram] = 1 if binary else trigrams.get(trigram,0)+1
-                self.feature_labels.add(trigram)
-            prev_prev = prev
-            prev = token[0]
-        trigram = ' '.join([prev_prev, prev, '<END>'])
-        trigrams[trigram] = 1 if binary else trigrams.get(trigram,0)+1
-        self.feature_labels.add(trigram)
-        return trigrams
-
-
-    def get_tetragrams(self, tokens):
+    def select_features(self, document_frequencies:dict, min_df:int=None):
         """
-        Tetragrams with skip points!
+        Returns the features that are kept by min df (self.min_df, unless given),
+        max ngram features and max features (in this order), as dict of
+        feature --> df. Features with equal df are kept in order of first
+        appearance, so the selection is the same in each run.
         """
-        binary = True if self.score == 'binary' else False
-        tetragrams = []  # Simple tetragrams, list of lists
-        skip_tetr = {} # Tetragrams with skip
-        prev = None
-        prev_prev = None
-        prev_prev_prev = None
-        for token in tokens:
-            if prev_prev_prev:
-                t = [prev_prev_prev, prev_prev, prev, token[0]]
-                tetragrams.append(t)
-            prev_prev_prev = prev_prev
-            prev_prev = prev
-            prev = token[0]
-        for t in tetragrams:
-            skip_a = list(t)
-            skip_b = list(t)
-            # Replace 2nd and 3d tokens with skip
-            skip_a[1] = '<SKIP>'
-            skip_b[2] = '<SKIP>'
-            skip_a = ' '.join(skip_a)
-            skip_b = ' '.join(skip_b)
-            skip_tetr[skip_a]=1 if binary else skip_tetr.get(skip_a,0)+1
-            self.feature_labels.add(skip_a)
-            skip_tetr[skip_b]=1 if binary else skip_tetr.get(skip_b,0)+1
-            self.feature_labels.add(skip_b)
-        return skip_tetr
-
-
-    def calculate_idf_scores(self):
+        min_df = min_df or self.min_df or 1
+        kept = {f:df for f, df in document_frequencies.items() if df >= min_df}
+
+        if self.max_ngram_features:
+            orders = {}
+            for f in kept:
+                orders.setdefault(f.count(' ') + 1, []).append(f)
+            for order, cap in self.max_ngram_features.items():
+                features = orders.get(order, [])
+                if len(features) > cap:
+                    features.sort(key=kept.get, reverse=True)
+                    for f in features[cap:]:
+                        del kept[f]
+
+        if self.max_features and len(kept) > self.max_features:
+            features = sorted(kept, key=kept.get, reverse=True)[:self.max_features]
+            kept = {f:kept[f] for f in features}
+
+        return kept
+
+
+    def pruning_report(self, min_dfs=(1, 2, 3, 5, 10), num_classes:int=6):
+        """
+        Returns the vocabulary size and the size of the perceptron weights (see
+        weights_size) for each min df in min_dfs, applied on top of the other
+        pruning parameters, as list of (min df, features, MiB, MiB saved). Only
+        available if features were pruned in extract.
+        """
+        assert self.document_frequencies is not None, 'Features were not pruned'
+        full_size = weights_size(len(self.document_frequencies), num_classes)
+        report = []
+        for min_df in min_dfs:
+            size = len(self.select_features(self.document_frequencies, min_df))
+            memory = weights_size(size, num_classes)
+            report.append((min_df, size, memory / 1024**2, (full_size - memory) / 1024**2))
+        return report
+
+
+    def calculate_idf_scores(self, document_frequencies):
         """
-        Extracts terms from corpus and adds them to self.__term_idfs. Calculates
-        df score (=document frequency, i.e. number of tweets in which the term
-        occurs). Finally df's
-        are converted to idf's (=inverted df, i.e. documents with low df get a
-        higher score).
+        Converts df scores (=document frequency, i.e. number of tweets in which
+        the feature occurs, counted by extract) into idf's (=inverted df, i.e.
+        features with low df get a higher score).
         """
 
         self.feature_idf_scores = {}
         corpus_size = self.corpus.length()
 
-        # Count document frequencyt of each feature
-        for tweet in self.corpus:
-            features = set()
-            if 1 in self.ngrams:
-                terms = Tokenizer().get_terms(tweet.get_text(), **self.token_options)
-                for term in terms:
-                    features.add(term[0])
-            if 2 in self.ngrams:
-                tokens = Tokenizer().get_tokens(tweet.get_text(), **self.token_options)
-                previous_token = '<BEGIN>'
-                for token in tokens:
-                    bigram = previous_token + ' ' + token[0]
-                    previous_token = token[0]
-                    features.add(bigram)
-            if 3 in self.ngrams:
-                tokens = Tokenizer().get_tokens(tweet.get_text(), **self.token_options)
-                previous_token = '<BEGIN>'
-                previous_previous = None
-                for token in tokens:
-                    if previous_previous:
-                        trigram = previous_previous + ' ' + previous_token + ' ' + token[0]
-                        features.add(trigram)
-                    previous_previous = previous_token
-                    previous_token = token[0]
-            # TODO: Add tetragrams?
+        #  Convert df's into idf's (inverted document frequency)
+        for f, df in document_frequencies.items():
+            self.feature_idf_scores[f] = log10(corpus_size / df)
 
-            for f in features:
-                self.feature_idf_scores[f] = self.feature_idf_scores.get(f,0)+1
 
-        #  Convert df's into idf's (inverted document frequency)
-        for f in self.feature_idf_scores.keys():
-            self.feature_idf_scores[f] = log10(corpus_size / self.feature_idf_scores[f])
+    def save_idf_scores(self, filename:str):
+        """
+        Saves the idf scores as compact arrays in a .npz file, to store them
+        with the model: the feature names as utf-8 table, one per line (or the
+        hash indices as array), and the scores as float32.
+        """
+        features = list(self.feature_idf_scores)
+        idf = np.array([self.feature_idf_scores[f] for f in features], dtype=np.float32)
+        if self.hash_bits:
+            np.savez(filename, indices=np.array(features, dtype=np.int64), idf=idf)
+            return
+        assert not any('\n' in f for f in features), 'Feature names must not contain newlines'
+        table = '\n'.join(features).encode('utf-8')
+        np.savez(filename, names=np.frombuffer(table, dtype=np.uint8), idf=idf)
+
+
+    @staticmethod
+    def load_idf_scores(filename:str):
+        """ Returns the idf scores saved by save_idf_scores as dict. """
+        with np.load(filename) as saved:
+            idf = saved['idf'].tolist()
+            if 'indices' in saved:
+                return dict(zip(saved['indices'].tolist(), idf))
+            table = saved['names'].tobytes().decode('utf-8')
+        return dict(zip(table.split('\n') if idf else [], idf))
+
+
+# Featurer of each worker process, see Featurer.__count_corpus
+_worker_featurer = None
+
+
+def _init_worker(parameters, token_options, feature_index):
+    global _worker_featurer
+    _worker_featurer = Featurer(None, parameters, token_options, feature_index=feature_index)
+
+
+def _count_shard(texts):
+    counted = _worker_featurer.count_batch([Tweet(text) for text in texts])
+    # Feature names and new POS tags are collected by the main process
+    _worker_featurer.feature_labels.clear()
+    pos_tags = {}
+    if _worker_featurer.pos_tagger:
+        pos_tags = _worker_featurer.pos_tagger.new_tags
+        _worker_featurer.pos_tagger.new_tags = {}
+    return counted, pos_tags
+
+
+# Memory (bytes) per entry of a dict, measured once. Dicts grow in steps, so
+# this is an average between a full and a freshly grown dict
+_DICT_ENTRY_SIZE = sys.getsizeof({f:0 for f in range(1024)}) / 1024
+
+
+def weights_size(num_features:int, num_classes:int=6):
+    """
+    Returns the estimated memory (bytes) of the weights and averaged weights
+    of a mcPerceptron with num_features feature names, i.e. of two dicts of
+    feature --> weight per class. Feature names are shared with the corpus and
+    are not counted.
+    """
+    return int(2 * num_classes * num_features * _DICT_ENTRY_SIZE)
+
+
+def idf_filename(model_filename:str):
+    """ Returns the name of the idf file that belongs to a saved model. """
+    return model_filename + '.idf.npz'
@@ -1,7 +1,12 @@
+from array import array
+from multiprocessing import Pipe, Process, RawArray
 from operator import itemgetter
+from random import Random
+import numpy as np
 from tweet import Tweet
 from evaluator.result import Result
 from evaluator.scorer import Scorer
+from model_file import ModelFile
 import json
 
 class mcPerceptron(object):
@@ -11,17 +16,69 @@ class mcPerceptron(object):
         Args:
             classes: a list contaning the class names as strings
             feature_names: a list containing all names of the features that are used.
+            idf_scores: (optional) idf scores of the Featurer, saved with the
+                model in the binary model format (see model_file.py)
+
+        If the parameter 'hash bits' is set, features are indices (see
+        Featurer) and the weights of each class are a fixed-size array.
+        The same goes for a loaded model (see load_model), whose features are
+        indices of feature_index.
+
+        If the parameter 'weight matrix' is set, the weights are a float32
+        matrix of shape (classes, features) instead, whose columns are given by
+        feature_index (or the hash indices). Activations are then computed as
+        dot product of the weights of the tweet's features and their values, and
+        updates add to two rows of the matrix at once. Given the FeatureMatrix
+        of a test corpus (see Featurer), the whole corpus is predicted at once,
+        see predict_scores.
+
+        If the parameter 'sparse weights' is set (and no weight matrix), the
+        weights are dicts that only hold the weights that were updated, all
+        other weights are 0. If the parameter 'quantization' is 'float16' or
+        'int8', models in the binary format are saved quantized.
+
+        If the parameter 'train workers' is set (with a weight matrix), the
+        perceptron is trained with iterative parameter mixing, see
+        train_parallel.
     """
 
-    def __init__(self, classes:list, parameters:dict, token_options:dict, feature_names:set=None):
+    def __init__(self, classes:list, parameters:dict, token_options:dict, feature_names:set=None,
+            idf_scores:dict=None):
         self.parameters = parameters
         self.token_options = token_options
+        self.idf_scores = idf_scores
+        self.config = {p:parameters.get(p) for p in ('ngrams', 'score', 'count pos', 'hash bits')}
         self.lr = parameters['learning rate']
         self.classes = classes  # Names of emotions
         self.num_steps = 0  # Used to average weights
         self.curr_step = 0  # Used to average weights
+        self.hash_bits = parameters.get('hash bits')
+        self.feature_index = None  # feature --> index, set by load_model
+        self.weight_matrix = parameters.get('weight matrix', False)
+        self.sparse_weights = parameters.get('sparse weights', False)
+        self.class_ids = {c:i for i, c in enumerate(classes)}
+        self.test_scores = None  # scores of the last test with a FeatureMatrix
+        # Initialize weights as matrices: [class id, index of feature]
+        if self.weight_matrix and (self.hash_bits or feature_names):
+            if self.hash_bits:
+                size = 2 ** self.hash_bits
+            else:
+                # Columns in sorted order, to get the same model in each run
+                self.feature_index = {f:i for i, f in enumerate(sorted(feature_names))}
+                size = len(self.feature_index)
+            self.weights = np.zeros((len(classes), size), dtype=np.float32)
+            self.averaged_weights = np.zeros((len(classes), size), dtype=np.float32)
+        # Initialize weights as empty dicts: ("class" --> ("feature" --> weight if not 0))
+        elif self.sparse_weights:
+            self.weights = {c:{} for c in classes}
+            self.averaged_weights = {c:{} for c in classes}
+        # Initialize weights as dict of arrays: ("class" --> [weight of index])
+        elif self.hash_bits:
+            size = 2 ** self.hash_bits
+            self.weights = {c:array('d', bytes(8 * size)) for c in classes}
+            self.averaged_weights = {c:array('d', bytes(8 * size)) for c in classes}
         # Initialize weights as dict of dicts: ("class" --> ("feature" --> weight))
-        if feature_names:
+        elif feature_names:
             self.weights = {c:{f:0 for f in feature_names} for c in classes}
             self.averaged_weights = {c:{f:0 for f in feature_names} for c in classes}
 
@@ -30,12 +87,32 @@ class mcPerceptron(object):
         """ Updates the weights of the perceptron.
             Args:
                 features: an iterable containg the names of the features of the current example
+                    (a tuple of arrays of indices and values with a weight matrix, see vectorize)
                 prediction: the predicted label as a string
                 true_label: the true label as a string
         """
         if prediction != true_label: # only update if prediction was wrong
             # Calculate rate for averaging
             r = (self.curr_step / self.num_steps) if self.curr_step != 0 else 0
+            if self.weight_matrix:
+                indices, values = features
+                z = values * self.lr
+                avg_z = r * z
+                true_id, predicted_id = self.class_ids[true_label], self.class_ids[prediction]
+                self.weights[true_id, indices] += z
+                self.averaged_weights[true_id, indices] += avg_z
+                self.weights[predicted_id, indices] -= z
+                self.averaged_weights[predicted_id, indices] -= avg_z
+                return
+            if self.sparse_weights:
+                weights, averaged_weights = self.weights, self.averaged_weights
+                for feat in features:
+                    z = (features[feat] * self.lr)
+                    avg_z = (r*z)
+                    for c, sign in ((true_label, 1), (prediction, -1)):
+                        weights[c][feat] = weights[c].get(feat, 0) + sign * z
+                        averaged_weights[c][feat] = averaged_weights[c].get(feat, 0) + sign * avg_z
+                return
             for feat in features:
                 z = (features[feat] * self.lr)
                 avg_z = (r*z)
@@ -52,20 +129,31 @@ class mcPerceptron(object):
             for each class and returns the class with the highest activation.
             Args:
                 features: dictionary containing features and values for these
+                    (or a tuple of arrays, see vectorize, with a weight matrix)
                 example: tweet object for which prediction is made
             Returns:
                 a tuple containg (predicted_label, activation score)
         """
         weights = self.averaged_weights if test_mode else self.weights
         activations = []
-        # calculate activation for each class
-        for c in self.classes:
-            curr_activation = 0
-            for feat in features:
-                # necessary if test examples contain unseen features - is there a better way to handle this?
-                if feat in weights[c]:
-                    curr_activation += weights[c][feat] * features[feat]
-            activations.append((c, curr_activation))
+        if self.weight_matrix:
+            if isinstance(features, dict):
+                features = self.vectorize(features)
+            indices, values = features
+            # Gather the weights of the features and dot with their values
+            activations = list(zip(self.classes, (weights[:, indices] @ values).tolist()))
+        else:
+            # Weights of indices (arrays) have a weight for any feature
+            indexed = not isinstance(weights[self.classes[0]], dict)
+            # calculate activation for each class
+            for c in self.classes:
+                curr_activation = 0
+                for feat in features:
+                    # necessary if test examples contain unseen features - is there a better way to handle this?
+                    # (indexed features always have a weight, sparse weights not)
+                    if indexed or feat in weights[c]:
+                        curr_activation += weights[c][feat] * features[feat]
+                activations.append((c, curr_activation))
         # highest activation in activation[0]
         activations.sort(key=itemgetter(1), reverse=True)
         # set prediction in tweet
@@ -73,13 +161,28 @@ class mcPerceptron(object):
         return activations
 
 
-    def train_and_test(self, train_corpus, test_corpus):
+    def vectorize(self, features:dict, feature_index:dict=None):
+        """ Returns the features as tuple of arrays of indices and values, for
+            the weight matrix.
+            Args:
+                features: dictionary containing features (indices) and values
+                (optional) feature_index: maps features to indices, if features
+                    are names. Features that are not in the index are dropped.
+        """
+        if feature_index is not None:
+            features = {feature_index[f]:value for f, value in features.items()
+                if f in feature_index}
+        return (np.fromiter(features.keys(), dtype=np.intp, count=len(features)),
+            np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+
+
+    def train_and_test(self, train_corpus, test_corpus, test_features=None):
 
         if self.parameters['print results'] or self.parameters['save results'] \
             or self.parameters['print plot']:
             result = Result()
 
-        self.train(train_corpus, test_corpus, result)
+        self.train(train_corpus, test_corpus, result, test_features)
 
         if self.parameters['print plot']:
             result.draw_graph(self.token_options, self.parameters['score'])
@@ -90,7 +193,7 @@ class mcPerceptron(object):
                     f.write(tweet.get_pred_label() + "\n")
 
 
-    def train(self, train_corpus, test_corpus=None, result=None):
+    def train(self, train_corpus, test_corpus=None, result=None, test_features=None):
         """ Function to train the MulticlassPerceptron. Optionally writes weights
             and accuracy into files.
             Args:
@@ -98,18 +201,29 @@ class mcPerceptron(object):
                 examples: corpus (iterable) containing Tweets
                 fn_acc: file where to write accuracy scores for each iteration
                 fn_acc: file where to write weights for each iteration
+                (optional) test_features: FeatureMatrix of test_corpus, see test
                 # TODO
         """
+        if self.parameters.get('train workers'):
+            self.train_parallel(train_corpus, test_corpus, result, test_features)
+            return
         epochs = self.parameters['epochs']
         self.num_steps = epochs * train_corpus.length()
         self.curr_step = self.num_steps
         acc = 0  # accuracy score
+        if self.weight_matrix:
+            # Features of the train tweets as arrays, once for all epochs
+            vectors = {tweet:self.vectorize(tweet.get_features(), self.feature_index)
+                for tweet in train_corpus}
         for i in range(epochs):
             corr = 0  # correct predictions during current iteration
             train_corpus.shuffle()  # shuffle tweets
             for tweet in train_corpus:
                 true_label = tweet.get_gold_label()
-                tweet_features = tweet.get_features() # dict
+                if self.weight_matrix:
+                    tweet_features = vectors[tweet]
+                else:
+                    tweet_features = tweet.get_features() # dict
                 prediction = self._predict(tweet_features, tweet)[0][0]
                 self.__update_weights(tweet_features, prediction, true_label)
                 self.curr_step -= 1
@@ -122,7 +236,7 @@ class mcPerceptron(object):
 
             # Test on current weights
             if test_corpus:
-                self.test(test_corpus, test_mode=True)
+                self.test(test_corpus, test_mode=True, test_features=test_features)
                 scores = Scorer(test_corpus)
 
                 if self.parameters['print results']:
@@ -136,13 +250,119 @@ class mcPerceptron(object):
             self.save_model()
 
 
-    def test_model(self, test_corpus):
+    def train_parallel(self, train_corpus, test_corpus=None, result=None, test_features=None):
+        """ Trains like train, with iterative parameter mixing (distributed
+            perceptron): the train tweets are split into one shard per worker.
+            In each epoch, each worker trains a copy of the current weights on
+            its shard, then the weights of the workers are mixed (averaged) and
+            are the weights of the next epoch.
+            With the parameter 'mixing' set to 'mistakes', the weights of each
+            worker are weighted by the mistakes it made in the epoch (instead
+            of uniformly).
+            Averaged weights are updated by the workers and mixed the same way.
+            Each worker averages as if it trained on its shard alone, so the
+            mixed averaged weights are the average of the mixed weights over
+            all steps, as in train.
+            Each worker is a process that gets its shard once, weights are
+            passed to and from the workers in shared memory.
+            Shards and the order of each shard are shuffled with the parameter
+            'seed', so the model is the same for a given seed and number of
+            workers.
+            Args:
+                see train
+        """
+        assert self.weight_matrix, 'Parallel training needs a weight matrix'
+        epochs = self.parameters['epochs']
+        workers = self.parameters['train workers']
+        mixing = self.parameters.get('mixing') or 'uniform'
+        assert mixing in ('uniform', 'mistakes'), 'Invalid mixing ({})'.format(mixing)
+        seed = self.parameters.get('seed') or 0
+        tweets = list(train_corpus)
+        Random(seed).shuffle(tweets)
+        vectors = [self.vectorize(tweet.get_features(), self.feature_index) for tweet in tweets]
+        labels = [tweet.get_gold_label() for tweet in tweets]
+        # Weights are shared with the workers: [0] the weights of the epoch and
+        # [1] the averaged weights, [2 + 2k] and [3 + 2k] those of worker k
+        shape = self.weights.shape
+        shared = RawArray('f', (2 + 2 * workers) * self.weights.size)
+        matrices = _shared_matrices(shared, shape)
+        matrices[0], matrices[1] = self.weights, self.averaged_weights
+        # One process per shard, which gets its shard once
+        connections, processes = [], []
+        for k in range(workers):
+            connection, worker_connection = Pipe()
+            shard = (vectors[k::workers], labels[k::workers])
+            process = Process(target=_train_worker, args=(worker_connection, shared, shape, k,
+                shard, self.classes, self.lr, epochs, seed), daemon=True)
+            process.start()
+            # Only the worker holds its end, so recv fails if the worker exits
+            worker_connection.close()
+            connections.append(connection)
+            processes.append(process)
+        try:
+            for i in range(epochs):
+                for connection in connections:
+                    connection.send(i)
+                mistakes = [_receive(connection) for connection in connections]
+                if mixing == 'mistakes' and sum(mistakes):
+                    mix = [m / sum(mistakes) for m in mistakes]
+                else:
+                    mix = [1 / workers] * workers
+                # Mixed in the order of the shards, to get the same model in each run
+                self.weights = sum(mu * matrices[2 + 2 * k] for k, mu in enumerate(mix))
+                self.averaged_weights = sum(mu * matrices[3 + 2 * k] for k, mu in enumerate(mix))
+                matrices[0], matrices[1] = self.weights, self.averaged_weights
+                acc = round(1 - sum(mistakes) / len(tweets), 2)
+
+                # Test on current weights
+                if test_corpus:
+                    self.test(test_corpus, test_mode=True, test_features=test_features)
+                    scores = Scorer(test_corpus)
+
+                    if self.parameters['print results']:
+                        result.show(scores, acc)
+
+                    if self.parameters['save results']:
+                        result.write(acc, scores, self.parameters['save results'])
+        finally:
+            for connection in connections:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass  # the worker has exited already
+            for process in processes:
+                process.join()
+
+        # Write final weights to file
+        if self.parameters['save model']:
+            self.save_model()
+
+
+    def train_shard(self, vectors:list, labels:list, order:list):
+        """ Trains the weights on the tweets of a shard (see train_parallel)
+            in the given order and returns the number of mistakes.
+            Args:
+                vectors: features of the tweets, see vectorize
+                labels: gold labels of the tweets
+                order: indices of the tweets
+        """
+        example = Tweet('')  # takes the predicted labels
+        mistakes = 0
+        for j in order:
+            prediction = self._predict(vectors[j], example)[0][0]
+            self.__update_weights(vectors[j], prediction, labels[j])
+            self.curr_step -= 1
+            mistakes += prediction != labels[j]
+        return mistakes
+
+
+    def test_model(self, test_corpus, test_features=None):
+        """ Tests a model loaded with load_model. """
 
-        self.load_model()
         if self.parameters['print results'] or self.parameters['save results']:
             result = Result()
 
-        self.test(test_corpus)
+        self.test(test_corpus, test_features=test_features)
 
         scores = Scorer(test_corpus)
 
@@ -153,7 +373,7 @@ class mcPerceptron(object):
             result.write(acc, scores, self.parameters['save results'])
 
 
-    def test(self, test_corpus, test_mode=False):
+    def test(self, test_corpus, test_mode=False, test_features=None):
         """
         Will use custom weights is passed by argument, otherwise class weights
         will be used.
@@ -161,24 +381,125 @@ class mcPerceptron(object):
         Args:
         examples: corpus (iterable) containing Tweets
         weights: (optional) use custom weights
+        test_features: (optional) FeatureMatrix of the corpus (in transform
+            or hash mode, see Featurer). With a weight matrix, all tweets are
+            then predicted at once, and the scores are kept in test_scores.
         """
         # reset class weights if custom weights are provided
         #if weights:
         #    self.load_model(weights)
 
+        if self.weight_matrix and test_features is not None:
+            self.test_scores = self.predict_scores(test_features, test_mode)
+            predictions = self.test_scores.argmax(axis=1).tolist()
+            for tweet, c in zip(test_corpus, predictions):
+                tweet.set_pred_label(self.classes[c])
+            return
+
         for tweet in test_corpus:
             self._predict(tweet.get_features(), tweet, test_mode)
 
 
+    def predict_scores(self, features, test_mode=False):
+        """ Returns the activations of all tweets and classes at once, as
+            matrix of shape (tweets, classes), for a weight matrix.
+            Args:
+                features: FeatureMatrix whose columns are the indices of the
+                    weights (see Featurer in transform or hash mode)
+                test_mode: use the averaged weights
+        """
+        weights = self.averaged_weights if test_mode else self.weights
+        return np.asarray(features.matrix @ weights.T)
+
+
     def save_model(self, filename=None):
+        """ Saves the averaged weights, as json (appended to the file) or in
+            the binary model format if the parameter 'model format' is 'binary'.
+        """
         f = filename if filename else self.parameters['save model']
+        if self.parameters.get('model format') == 'binary':
+            self.get_model_file().save(f)
+            return
         with open(f, 'a') as w:
-            w.write(json.dumps(self.averaged_weights) + '\n')
-
-
-    def load_model(self):
-        with open(self.parameters['load model'], 'r') as w:
-            self.weights = json.load(w)
+            if self.weight_matrix:
+                rows = self.averaged_weights.tolist()
+                if not self.hash_bits:
+                    features = sorted(self.feature_index, key=self.feature_index.get)
+                    rows = [dict(zip(features, row)) for row in rows]
+                w.write(json.dumps(dict(zip(self.classes, rows))) + '\n')
+            elif self.hash_bits:
+                w.write(json.dumps({c:list(self.__dense(a)) for c, a in self.averaged_weights.items()}) + '\n')
+            else:
+                w.write(json.dumps(self.averaged_weights) + '\n')
+
+
+    def get_model_file(self):
+        """ Returns the averaged weights and config as ModelFile. """
+        if self.weight_matrix:
+            weights = self.averaged_weights
+            # Columns are sorted already
+            feature_names = None if self.hash_bits else list(self.feature_index)
+        elif self.hash_bits:
+            weights = np.array([self.__dense(self.averaged_weights[c]) for c in self.classes],
+                dtype=np.float32)
+            feature_names = None
+        else:
+            feature_names = sorted(set().union(*self.averaged_weights.values()))
+            weights = np.array([[self.averaged_weights[c].get(f, 0) for f in feature_names]
+                for c in self.classes], dtype=np.float32)
+        idf = None
+        if self.idf_scores:
+            feature_index = None if self.hash_bits else \
+                {f:i for i, f in enumerate(feature_names)}
+            idf = ModelFile.idf_array(self.idf_scores, feature_index, weights.shape[1])
+        model = ModelFile(self.classes, self.token_options, self.config, feature_names,
+            weights, idf)
+        if self.parameters.get('quantization'):
+            model = model.quantize(self.parameters['quantization'])
+        return model
+
+
+    def __dense(self, weights):
+        # Hashed weights as array, also if they are sparse (dict)
+        if not isinstance(weights, dict):
+            return weights
+        dense = array('d', bytes(8 * 2 ** self.hash_bits))
+        for index, weight in weights.items():
+            dense[index] = weight
+        return dense
+
+
+    def load_model(self, filename=None):
+        """ Loads the weights of a saved model. Weights of feature names are
+            stored as arrays (or as weight matrix), in the order of
+            feature_index, which is to be given to the Featurer of test tweets
+            (transform mode). Models saved as json are read with
+            ModelFile.from_json.
+            Models in the binary format also set classes, token_options, config
+            and idf_scores. Their weights are memory-mapped with a weight matrix.
+        """
+        filename = filename if filename else self.parameters['load model']
+        if ModelFile.is_model_file(filename):
+            model = ModelFile.load(filename)
+        else:
+            model = ModelFile.from_json(filename, self.classes, self.token_options, self.config)
+        self.load_model_file(model)
+
+
+    def load_model_file(self, model:ModelFile):
+        """ Loads the weights of a ModelFile, see load_model. """
+        self.classes = model.classes
+        self.class_ids = {c:i for i, c in enumerate(self.classes)}
+        self.token_options = model.token_options
+        self.config = model.config
+        self.hash_bits = model.config.get('hash bits')
+        self.idf_scores = model.get_idf_scores()
+        self.feature_index = model.get_feature_index()
+        weights = model.get_weights()
+        if self.weight_matrix:
+            self.weights = weights
+        else:
+            self.weights = {c:array('d', row.tolist()) for c, row in zip(self.classes, weights)}
 
 
     def __debug_print_prediction(self, example, prediction):
@@ -186,3 +507,42 @@ class mcPerceptron(object):
         print("tweet text: " + example.get_text())
         print("prediction: " + example.get_pred_label())
         print(prediction)
+
+
+def _shared_matrices(shared, shape):
+    """ Returns the weight matrices in shared (RawArray of float32). """
+    return np.frombuffer(shared, dtype=np.float32).reshape((-1,) + shape)
+
+
+def _train_worker(connection, shared, shape, k, shard, classes, lr, epochs, seed):
+    # Trains on shard k for each epoch received from connection, until None
+    matrices = _shared_matrices(shared, shape)
+    model = mcPerceptron(classes, {'learning rate': lr, 'weight matrix': True}, {})
+    model.weights, model.averaged_weights = matrices[2 + 2 * k], matrices[3 + 2 * k]
+    vectors, labels = shard
+    epoch = connection.recv()
+    while epoch is not None:
+        model.weights[:], model.averaged_weights[:] = matrices[0], matrices[1]
+        # Steps to average as if the shard was trained on alone (see train)
+        model.num_steps = epochs * len(vectors)
+        model.curr_step = (epochs - epoch) * len(vectors)
+        order = list(range(len(vectors)))
+        Random('{} {} {}'.format(seed, epoch, k)).shuffle(order)
+        try:
+            connection.send(model.train_shard(vectors, labels, order))
+        except Exception as error:
+            # Raised again by train_parallel, see _receive
+            connection.send(error)
+            return
+        epoch = connection.recv()
+
+
+def _receive(connection):
+    # Mistakes of a worker of train_parallel, errors of the worker are raised
+    try:
+        result = connection.recv()
+    except EOFError:
+        raise RuntimeError('A training worker exited unexpectedly')
+    if isinstance(result, Exception):
+        raise result
+    return result
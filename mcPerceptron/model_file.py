@@ -0,0 +1,233 @@
+import json
+import struct
+
+import numpy as np
+
+
+class ModelFile(object):
+    """
+    :ModelFile:
+
+    Binary file of a trained mcPerceptron, with everything that is needed to
+    featurize and predict new tweets. Weights are loaded with np.memmap, so
+    loading takes about as long as reading the feature names.
+
+    :Layout:
+        - magic -- b'BRAINTPM' (8 bytes)
+        - version, header size -- uint32 each, little endian
+        - header -- json: classes, token options, config (ngrams, score,
+            count pos, hash bits), number of features, size of feature table
+        - feature table -- sorted feature names, utf-8, one per line (empty
+            in hash mode, where features are hash indices)
+        - weights -- float32 matrix (classes, features), 64-byte aligned, or
+            quantized to float16 or int8 (see quantize)
+        - scales -- float32 array (classes), only for int8 weights, 64-byte
+            aligned
+        - idf -- float32 array (features), 0 for features without idf score
+            (same as no score, see Featurer.weight_features), 64-byte aligned
+
+    :Usage:
+        model = ModelFile(classes, token_options, config, feature_names, weights)
+        model.save(filename)
+        model = ModelFile.load(filename)
+        model = ModelFile.from_json(legacy_filename, classes, token_options, config)
+        model.quantize('int8').save(filename)
+    """
+
+    MAGIC = b'BRAINTPM'
+    VERSION = 1
+    ALIGNMENT = 64
+    DTYPES = {'float32': '<f4', 'float16': '<f2', 'int8': 'i1'}
+
+
+    def __init__(self, classes:list, token_options:dict, config:dict,
+            feature_names:list, weights, idf=None, scales=None):
+        """
+        feature_names are the names of the weight columns in sorted order, or
+        None in hash mode. weights, scales and idf are arrays as in Layout,
+        idf is optional.
+        """
+        self.classes = classes
+        self.token_options = token_options
+        self.config = config
+        self.feature_names = feature_names
+        self.weights = weights
+        self.idf = idf
+        self.scales = scales
+
+
+    def get_weights(self):
+        """ Returns the weights as float32 matrix (quantized weights are
+            converted back, so they are no longer memory-mapped). """
+        if self.weights.dtype == np.float32:
+            return self.weights
+        weights = self.weights.astype(np.float32)
+        if self.scales is not None:
+            weights *= np.asarray(self.scales)[:, np.newaxis]
+        return weights
+
+
+    def quantize(self, dtype:str):
+        """
+        Returns a copy with the weights quantized to 'float16', or to 'int8'
+        with a scale per class (the largest absolute weight of the class is
+        mapped to 127). 'float32' returns the weights without quantization.
+        """
+        assert dtype in self.DTYPES, 'Invalid quantization ({})'.format(dtype)
+        weights = self.get_weights()
+        scales = None
+        if dtype == 'float32':
+            quantized = weights
+        elif dtype == 'float16':
+            quantized = weights.astype(np.float16)
+        else:
+            scales = np.abs(weights).max(axis=1) / 127
+            scales[scales == 0] = 1
+            quantized = np.clip(np.rint(weights / scales[:, np.newaxis]), -127, 127) \
+                .astype(np.int8)
+            scales = scales.astype(np.float32)
+        return ModelFile(self.classes, self.token_options, self.config, self.feature_names,
+            quantized, self.idf, scales)
+
+
+    def get_feature_index(self):
+        """ Returns a dict of feature --> column, or None in hash mode. """
+        if self.feature_names is None:
+            return None
+        return {f:i for i, f in enumerate(self.feature_names)}
+
+
+    def get_idf_scores(self):
+        """ Returns the idf scores as dict, like Featurer.feature_idf_scores. """
+        if self.idf is None:
+            return None
+        columns = np.flatnonzero(self.idf).tolist()
+        scores = self.idf[columns].tolist()
+        if self.feature_names is None:
+            return dict(zip(columns, scores))
+        return {self.feature_names[j]:score for j, score in zip(columns, scores)}
+
+
+    @staticmethod
+    def idf_array(idf_scores:dict, feature_index:dict, num_columns:int):
+        """ Returns idf scores (dict) as array in the order of the columns. """
+        idf = np.zeros(num_columns, dtype=np.float32)
+        for f, score in idf_scores.items():
+            j = f if feature_index is None else feature_index.get(f)
+            if j is not None:
+                idf[j] = score
+        return idf
+
+
+    def save(self, filename:str):
+        if self.feature_names is None:
+            table = b''
+        else:
+            names = self.feature_names
+            assert all(a < b for a, b in zip(names, names[1:])), \
+                'Feature names are not sorted'
+            assert not any('\n' in f for f in self.feature_names), \
+                'Feature names must not contain newlines'
+            table = '\n'.join(self.feature_names).encode('utf-8')
+        dtype = self.weights.dtype.name
+        assert dtype in self.DTYPES, 'Invalid weights dtype ({})'.format(dtype)
+        weights = np.ascontiguousarray(self.weights, dtype=self.DTYPES[dtype])
+        header = json.dumps({
+            'classes': self.classes,
+            'token options': self.token_options,
+            'config': self.config,
+            'features': weights.shape[1],
+            'feature table size': len(table),
+            'weights dtype': dtype,
+            'idf': self.idf is not None
+            }).encode('utf-8')
+        with open(filename, 'wb') as w:
+            w.write(self.MAGIC)
+            w.write(struct.pack('<II', self.VERSION, len(header)))
+            w.write(header)
+            w.write(table)
+            self.__pad(w)
+            w.write(weights.tobytes())
+            if self.scales is not None:
+                self.__pad(w)
+                w.write(np.ascontiguousarray(self.scales, dtype='<f4').tobytes())
+            if self.idf is not None:
+                self.__pad(w)
+                w.write(np.ascontiguousarray(self.idf, dtype='<f4').tobytes())
+
+
+    @classmethod
+    def load(cls, filename:str):
+        """ Loads a ModelFile, arrays are memory-mapped (read-only). """
+        with open(filename, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('{} is no model file'.format(filename))
+            version, header_size = struct.unpack('<II', f.read(8))
+            if version != cls.VERSION:
+                raise ValueError('Unsupported model file version {} (expecting {})'
+                    .format(version, cls.VERSION))
+            header = json.loads(f.read(header_size).decode('utf-8'))
+            table = f.read(header['feature table size']).decode('utf-8')
+            offset = cls.__align(f.tell())
+        config = header['config']
+        num_columns = header['features']
+        feature_names = None
+        if not config.get('hash bits'):
+            feature_names = table.split('\n') if num_columns else []
+        num_classes = len(header['classes'])
+        dtype = header.get('weights dtype', 'float32')
+        weights = np.memmap(filename, dtype=cls.DTYPES[dtype], mode='r', offset=offset,
+            shape=(num_classes, num_columns))
+        offset = cls.__align(offset + weights.nbytes)
+        scales = None
+        if dtype == 'int8':
+            scales = np.memmap(filename, dtype='<f4', mode='r', offset=offset,
+                shape=(num_classes,))
+            offset = cls.__align(offset + scales.nbytes)
+        idf = None
+        if header['idf']:
+            idf = np.memmap(filename, dtype='<f4', mode='r', offset=offset, shape=(num_columns,))
+        return cls(header['classes'], header['token options'], config, feature_names,
+            weights, idf, scales)
+
+
+    @classmethod
+    def from_json(cls, filename:str, classes:list, token_options:dict, config:dict,
+            idf_scores:dict=None):
+        """
+        Converts a model saved as json by mcPerceptron.save_model (legacy
+        format). If the file holds several models (save_model appends), the
+        last one is converted.
+        """
+        with open(filename, 'r') as f:
+            lines = [line for line in f if line.strip()]
+        weights = json.loads(lines[-1])
+        if config.get('hash bits'):
+            feature_names = None
+            feature_index = None
+            matrix = np.array([weights[c] for c in classes], dtype=np.float32)
+        else:
+            # Features of all classes (sparse weights are only saved if set)
+            feature_names = sorted(set().union(*(weights[c] for c in classes)))
+            feature_index = {f:i for i, f in enumerate(feature_names)}
+            matrix = np.array([[weights[c].get(f, 0) for f in feature_names] for c in classes],
+                dtype=np.float32)
+        idf = None
+        if idf_scores:
+            idf = cls.idf_array(idf_scores, feature_index, matrix.shape[1])
+        return cls(classes, token_options, config, feature_names, matrix, idf)
+
+
+    @staticmethod
+    def is_model_file(filename:str):
+        with open(filename, 'rb') as f:
+            return f.read(len(ModelFile.MAGIC)) == ModelFile.MAGIC
+
+
+    @classmethod
+    def __align(cls, offset:int):
+        return -(-offset // cls.ALIGNMENT) * cls.ALIGNMENT
+
+
+    def __pad(self, w):
+        w.write(b'\0' * (self.__align(w.tell()) - w.tell()))
@@ -0,0 +1,48 @@
+from itertools import repeat
+
+
+class NgramExtractor(object):
+    """
+    :NgramExtractor:
+
+    Extracts n-grams and skip-grams from lists of tokens (strings). A pattern
+    tells which tokens of a window make a gram, so any n and any skip points
+    can be extracted by the same code.
+
+    :Parameters:
+        - pattern -- 'x' for a token and '_' for a skipped token, e.g.:
+            -- 'xx' -- bigrams
+            -- 'xxx' -- trigrams
+            -- 'x_xx' -- tetragrams with the 2nd token skipped
+        - pad -- if True, '<BEGIN>' and '<END>' are added around the tokens
+
+    :Usage:
+        bigrams = NgramExtractor('xx', pad=True)
+        features.update(bigrams.count(tokens))
+    """
+
+    def __init__(self, pattern:str, pad:bool=False):
+        assert pattern and set(pattern) <= {'x', '_'} and pattern[0] == 'x' \
+            and pattern[-1] == 'x', 'Invalid n-gram pattern "{}"'.format(pattern)
+        self.pattern = pattern
+        self.n = len(pattern)
+        self.pad = pad
+
+
+    def count(self, tokens:list, binary:bool=False):
+        """
+        Returns a dict that maps the feature names of the grams in tokens to
+        their counts (always 1 if binary). Names are the tokens of a window
+        joined by spaces, e.g. 'i <SKIP> you too'.
+        """
+        if self.pad:
+            tokens = ['<BEGIN>'] + tokens + ['<END>']
+        windows = [tokens[i:] if p == 'x' else repeat('<SKIP>')
+            for i, p in enumerate(self.pattern)]
+        names = map(' '.join, zip(*windows))
+        if binary:
+            return dict.fromkeys(names, 1)
+        counts = {}
+        for name in names:
+            counts[name] = counts.get(name,0)+1
+        return counts
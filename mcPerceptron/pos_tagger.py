@@ -0,0 +1,77 @@
+import json
+import os
+
+from nltk.tag.perceptron import PerceptronTagger
+
+
+class PosTagger(object):
+    """
+    :PosTagger:
+
+    Tags batches of tokenized tweets with the tagger of nltk.pos_tag. Unlike
+    pos_tag, which loads the tagger on each call, the tagger is loaded once
+    and tags whole batches of tweets. Tags are cached per tweet (i.e. per list
+    of tokens, since these depend on the token options) in a json file, so
+    each tweet is only tagged once across experiments. Without a file, tags
+    are not cached, so memory does not grow when serving single tweets.
+
+    :Parameters:
+        - filename -- (optional) json file of cached tags, created by save()
+
+    :Usage:
+        tagger = PosTagger(filename)
+        tags = tagger.tag_batch([['i', 'love', 'it'], ...])  -  [['PRP', 'VBP', 'PRP'], ...]
+        tagger.save()
+    """
+
+    def __init__(self, filename:str=None):
+        self.filename = filename
+        self.tags = {}  # tokens joined by tabs --> tags joined by spaces
+        self.new_tags = {}  # tagged since the last save
+        self.tagger = None  # loaded when needed
+        if filename and os.path.isfile(filename):
+            with open(filename, 'r') as f:
+                self.tags = json.load(f)
+
+
+    def tag_batch(self, token_lists:list):
+        """ Returns the list of POS tags for each list of tokens. """
+        keys = ['\t'.join(tokens) for tokens in token_lists]
+        missing = {}
+        for key, tokens in zip(keys, token_lists):
+            if key not in self.tags and key not in missing:
+                missing[key] = tokens
+        tags = {}
+        if missing:
+            if not self.tagger:
+                self.tagger = PerceptronTagger()
+            tagged = self.tagger.tag_sents(list(missing.values()))
+            tags = {key:' '.join(tag for token, tag in tokens_with_pos)
+                for key, tokens_with_pos in zip(missing, tagged)}
+            if self.filename:
+                self.update(tags)
+        tags = [tags[key] if key in tags else self.tags[key] for key in keys]
+        return [tweet_tags.split(' ') if tweet_tags else [] for tweet_tags in tags]
+
+
+    def update(self, tags:dict):
+        """ Adds new tags, e.g. tagged by a worker process (see new_tags). """
+        self.tags.update(tags)
+        self.new_tags.update(tags)
+
+
+    def save(self):
+        """ Writes the cache file, if anything was tagged since it was read. """
+        if not self.filename or not self.new_tags:
+            return
+        # Merge tags saved by other runs in the meantime
+        if os.path.isfile(self.filename):
+            with open(self.filename, 'r') as f:
+                tags = json.load(f)
+            tags.update(self.tags)
+            self.tags = tags
+        tmp = self.filename + '.tmp{}'.format(os.getpid())
+        with open(tmp, 'w') as w:
+            json.dump(self.tags, w)
+        os.replace(tmp, self.filename)
+        self.new_tags = {}
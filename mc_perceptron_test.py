@@ -0,0 +1,57 @@
+"""
+Tests of parallel training of the mcPerceptron (see train_parallel in
+mcPerceptron/mc_perceptron.py): models must be the same for the same seed, and
+errors of workers must be raised instead of blocking the training. Run with
+pytest or as a script from the root folder of the repository.
+"""
+
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from featurer_test import labels, write_corpus
+
+from corpus import Corpus
+from featurer import Featurer
+from mc_perceptron import mcPerceptron
+
+parameters = {'score': 'frequency', 'ngrams': (1,2), 'count pos': False,
+    'print progressbar': False, 'epochs': 3, 'learning rate': 0.3, 'save model': None,
+    'weight matrix': True, 'train workers': 2, 'seed': 1}
+
+
+def train(filename, **options):
+    """ Returns a mcPerceptron trained in parallel on the corpus file. """
+    corpus = Corpus(filename)
+    Featurer(corpus, dict(parameters, **options), {})
+    model = mcPerceptron(labels, dict(parameters, **options), {},
+        corpus.get_all_feature_names())
+    model.train(corpus)
+    return model
+
+
+def test_same_seed():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        for options in ({}, {'mixing': 'mistakes'}, {'hash bits': 12}):
+            first, second = train(filename, **options), train(filename, **options)
+            assert (first.weights == second.weights).all() \
+                and (first.averaged_weights == second.averaged_weights).all(), \
+                'Different models for the same seed with {}'.format(options)
+
+
+def test_worker_error():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        # A label that is no class fails the worker that trains on it
+        with open(filename, 'a') as w:
+            w.write('sadness\tso sad\n')
+        with pytest.raises(KeyError, match='sadness'):
+            train(filename)
+
+
+if __name__ == '__main__':
+    test_same_seed()
+    test_worker_error()
+    print('Parallel training gives the same model for the same seed and raises errors.')
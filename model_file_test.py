@@ -0,0 +1,99 @@
+"""
+Tests of the binary model format (mcPerceptron/model_file.py): a model saved in
+the binary format, or converted from json, must give the same predictions as
+the json model. Quantized weights must be within the quantization error and
+give nearly the same predictions. Run with pytest or as a script from the root
+folder of the repository.
+"""
+
+import os
+import random
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from featurer_test import labels, write_corpus
+
+from corpus import Corpus
+from featurer import Featurer
+from mc_perceptron import mcPerceptron
+from model_file import ModelFile
+
+parameters = {'score': 'frequency', 'ngrams': (1,2), 'count pos': False,
+    'print progressbar': False, 'epochs': 3, 'learning rate': 0.3, 'save model': None}
+backends = ({}, {'hash bits': 12}, {'weight matrix': True}, {'sparse weights': True})
+
+
+def train(filename, **options):
+    """ Returns a mcPerceptron trained on the corpus file. """
+    random.seed(0)  # the corpus is shuffled in each epoch
+    corpus = Corpus(filename)
+    Featurer(corpus, dict(parameters, **options), {})
+    model = mcPerceptron(labels, dict(parameters, **options), {},
+        corpus.get_all_feature_names())
+    model.train(corpus)
+    return model
+
+
+def predict(model_filename, filename, **options):
+    """ Returns the predictions of a saved model for the corpus file. """
+    model = mcPerceptron(labels, dict(parameters, **options), {})
+    model.load_model(model_filename)
+    corpus = Corpus(filename)
+    Featurer(corpus, dict(parameters, **options), {}, feature_index=model.feature_index)
+    model.test(corpus)
+    return [tweet.get_pred_label() for tweet in corpus]
+
+
+def test_binary_model():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        for options in backends:
+            model = train(filename, **options)
+            json_model = os.path.join(directory, 'model.json')
+            binary_model = os.path.join(directory, 'model.bin')
+            converted_model = os.path.join(directory, 'converted.bin')
+            model.save_model(json_model)
+            model.get_model_file().save(binary_model)
+            ModelFile.from_json(json_model, labels, {}, model.config).save(converted_model)
+            predictions = predict(json_model, filename, **options)
+            assert predict(binary_model, filename, **options) == predictions, \
+                'Different predictions of the binary model for {}'.format(options)
+            assert predict(converted_model, filename, **options) == predictions, \
+                'Different predictions of the converted model for {}'.format(options)
+            os.remove(json_model)
+
+
+def test_quantization():
+    with TemporaryDirectory() as directory:
+        filename = write_corpus(directory)
+        for options in backends:
+            model = train(filename, **options)
+            json_model = os.path.join(directory, 'model.json')
+            quantized_model = os.path.join(directory, 'quantized.bin')
+            model.save_model(json_model)
+            predictions = predict(json_model, filename, **options)
+            model_file = model.get_model_file()
+            weights = model_file.get_weights()
+            for dtype in ('float16', 'int8'):
+                quantized = model_file.quantize(dtype)
+                if dtype == 'float16':
+                    error = np.abs(weights) * 2.0 ** -11 + 2.0 ** -24
+                else:
+                    error = quantized.scales[:, np.newaxis] / 2 + 1e-6
+                assert (np.abs(quantized.get_weights() - weights) <= error).all(), \
+                    'Weights out of {} quantization error for {}'.format(dtype, options)
+                quantized.save(quantized_model)
+                assert (ModelFile.load(quantized_model).get_weights()
+                    == quantized.get_weights()).all()
+                same = sum(p == q for p, q in zip(predictions,
+                    predict(quantized_model, filename, **options)))
+                assert same >= 0.95 * len(predictions), \
+                    'Different {} predictions for {}'.format(dtype, options)
+            os.remove(json_model)
+
+
+if __name__ == '__main__':
+    test_binary_model()
+    test_quantization()
+    print('Binary and quantized models give the same predictions as json models.')
@@ -1,9 +1,156 @@
 import string, re, emoji
+from array import array
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import Pool
 from utils.translate_emoticon import emoticon_to_label
 from utils.translate_emoji import emoji_to_label
 from nltk.corpus import stopwords
 from nltk.stem.snowball import SnowballStemmer
 
+
+def _required_chars(emoticon):
+    """
+    Returns the set of characters that any match of the emoticon pattern must
+    contain. Only literals, escapes, "." and the quantifiers "+" and "*" are
+    analyzed, for any other syntax an empty (i.e. always matching) set is
+    returned.
+    """
+    required = []
+    i = 0
+    while i < len(emoticon):
+        char = emoticon[i]
+        if char == '\\':
+            i += 1
+            char = '\0' if emoticon[i] == '0' else emoticon[i]
+            required.append(char)
+        elif char == '.':
+            required.append(None)
+        elif char == '+':
+            pass
+        elif char == '*':
+            required[-1] = None
+        elif char in '[](){}?|^$':
+            if char != ']':
+                return frozenset()
+            required.append(char)
+        else:
+            required.append(char)
+        i += 1
+    return frozenset(char for char in required if char)
+
+
+def _compile_emoticons():
+    """
+    Compiles the emoticon table once. Returns a regex that matches any of the
+    emoticons and for each of the three replacement modes (see get_tokens) the
+    list of compiled patterns with their replacement strings.
+    """
+    any_emoticon = re.compile('|'.join('(?:{})'.format(emoticon) for emoticon \
+        in emoticon_to_label))
+    substitutions = {'addit': [], 'replace': [], 'format': []}
+    for emoticon, label in emoticon_to_label.items():
+        pattern = (re.compile(emoticon), _required_chars(emoticon))
+        # Replace with emoticon + label (eg ":-)" > "[#:-)#] joy")
+        substitutions['addit'].append((pattern, '[#{}#] {}'.format(label[1:-1], emoticon)))
+        # Replace emoticon by label
+        substitutions['replace'].append((pattern, '[#{}#]'.format(label[1:-1])))
+        # Just format emoticon
+        substitutions['format'].append((pattern, '[#{}#]'.format(emoticon)))
+    return any_emoticon, substitutions
+
+_ANY_EMOTICON, _EMOTICON_SUBSTITUTIONS = _compile_emoticons()
+
+
+def _emoticon_mode(replace_emojis, addit_mode):
+    """ Returns the replacement mode of emoticons (see _compile_emoticons). """
+    if replace_emojis and addit_mode:
+        # Replace with emoticon + label (eg ":-)" > "[#:-)#] joy")
+        return 'addit'
+    elif replace_emojis:
+        # Replace emoticon by label
+        return 'replace'
+    # Just format emoticon
+    return 'format'
+
+
+def _option_values(lowercase=False, stem=False, replace_emojis=False,
+        replace_num=False, remove_stopw=False, remove_punct=False, addit_mode=True):
+    """ Returns the tokenizer options as tuple, in the order of get_tokens. """
+    return (lowercase, stem, replace_emojis, replace_num, remove_stopw,
+        remove_punct, addit_mode)
+
+
+def _build_emoji_table():
+    """
+    Maps each emoji (single codepoints and sequences such as skin tones, flags
+    and ZWJ sequences) to its label. Labels of the common emojis are taken from
+    emoji_to_label, of all other emojis from demojize. Also returns for each
+    first codepoint the lengths of the emojis starting with it, longest first.
+    """
+    labels = {e: emoji.demojize(e)[1:-1] for e in emoji.UNICODE_EMOJI}
+    labels.update({e: label[1:-1] for e, label in emoji_to_label.items()})
+    lengths = {}
+    for e in labels:
+        lengths.setdefault(e[0], set()).add(len(e))
+    return labels, {c: sorted(l, reverse=True) for c, l in lengths.items()}
+
+_EMOJI_LABELS, _EMOJI_SEQUENCE_LENGTHS = _build_emoji_table()
+_VARIATION_SELECTOR = '\ufe0f'
+# Labels of tokens and their codes in get_token_ids
+TAGS = ('word', 'punctuation', 'emoji', 'emoticon', 'hashtag', 'username',
+    'numeric', 'url', 'triggerword', 'other')
+TAG_CODES = {tag: code for code, tag in enumerate(TAGS)}
+_PUNCTUATION = frozenset(string.punctuation + '’…”“£—＠→♡°⁎«＼｜／')
+
+
+def _char_class(chars):
+    """ Returns the body of a regex character class with ranges of chars. """
+    codes = sorted(ord(char) for char in chars)
+    ranges = []
+    for code in codes:
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return ''.join(re.escape(chr(first)) if first == last else '{}-{}'.format(
+        re.escape(chr(first)), re.escape(chr(last))) for first, last in ranges)
+
+
+def _compile_lexer():
+    """
+    Compiles the master pattern of the lexer backend (see Tokenizer.__lex),
+    which splits a token into punctuation, possible emoji starts and runs of
+    remaining characters.
+    """
+    punct = _char_class(_PUNCTUATION)
+    # All characters outside of the BMP are taken as possible emojis, to keep
+    # the character classes small
+    emoji_starts = _char_class(char for char in _EMOJI_SEQUENCE_LENGTHS \
+        if char < '\U00010000') + '\U00010000-\U0010ffff'
+    return re.compile('(?P<punct>[{0}])|(?P<emoji>[{1}])|(?P<run>[^{0}{1}]+)'.format(
+        punct, emoji_starts))
+
+_LEXER = _compile_lexer()
+
+
+_STEMMER = SnowballStemmer('english')
+
+
+@lru_cache(maxsize=2**17)
+def _stem(word):
+    """
+    Stems a word with the Snowball stemmer. Results are cached for the whole
+    process, since most occurrences in tweets are of a few frequent words.
+    """
+    return _STEMMER.stem(word)
+
+
+@lru_cache(maxsize=None)
+def _load_stopwords():
+    """ Loads the NLTK stopwords once per process. """
+    return frozenset(stopwords.words('english'))
+
 class Tokenizer():
 
     """
@@ -16,7 +163,11 @@ class Tokenizer():
     :Usage:
         tokenizer = Tokenizer()
         tokenizer.get_tokens(text, OPTIONS)   -  for all tokens
+        tokenizer.iter_tokens(text, OPTIONS)   -  for all tokens, lazily
+        tokenizer.get_token_ids(text, vocabulary, OPTIONS)   -  for token ids
+        tokenizer.get_token_variants(text, [OPTIONS, ...])   -  for several options
         tokenizer.get_terms(text, OPTIONS)   -  for unique terms
+        tokenizer.get_tokens_batch(texts, OPTIONS)   -  for many texts at once
 
     :Options:
         All options are boolean and are by default False:
@@ -26,12 +177,30 @@ class Tokenizer():
             -- replace_num
             -- remove_stopw
             -- remove_punct
+
+    :Cache:
+        If cache_size is given, tokens are memoized per text and options, with
+        at most cache_size entries (least recently used are dropped first).
+        Tokens are then returned as tuples, so cached values can't be changed.
+        See get_cache_info() for hits and misses.
+
+    :Lexer:
+        If lexer is True, tweets are tokenized by a lexer that scans tokens
+        with one master pattern, instead of testing each character on its own.
+        It gives the same tokens.
+
+    A Tokenizer keeps no state between calls (except the thread-safe cache),
+    so one instance can be shared and reused for all tweets.
     """
 
-    def __init__(self):
-        self.punct = string.punctuation + '’…”“£—＠→♡°⁎«＼｜／'
-        self.stopwords = stopwords.words('english')
-        self.stemmer = SnowballStemmer('english')
+    def __init__(self, cache_size:int=None, lexer:bool=False):
+        self.punct = _PUNCTUATION
+        self.stopwords = _load_stopwords()
+        self.stemmer = _STEMMER
+        self.cache_size = cache_size
+        self.lexer = lexer
+        if cache_size:
+            self.__cached_tokens = lru_cache(maxsize=cache_size)(self.__immutable_tokens)
 
     def get_only_tokens(self, text):
         return [token for token, tag in self.get_tokens(text, False, False, False, False, False, False, False)]
@@ -45,102 +214,315 @@ class Tokenizer():
             remove_punct = False,
             addit_mode = True ):
 
+        # Options are passed by position, so that the cache key doesn't depend
+        # on the order of the keyword arguments
+        options = (lowercase, stem, replace_emojis, replace_num, remove_stopw,
+            remove_punct, addit_mode)
+        if self.cache_size:
+            return self.__cached_tokens(text, *options)
+        return self.__tokenize(text, *options)
+
+
+    def iter_tokens(self, text,
+            lowercase = False,
+            stem = False,
+            replace_emojis = False,
+            replace_num = False,
+            remove_stopw = False,
+            remove_punct = False,
+            addit_mode = True ):
+        """
+        Generator version of get_tokens: yields the same tokens one by one,
+        without building a list (unless they are cached).
+        """
+        options = (lowercase, stem, replace_emojis, replace_num, remove_stopw,
+            remove_punct, addit_mode)
+        if self.cache_size:
+            return iter(self.__cached_tokens(text, *options))
+        return self.__generate_tokens(text, *options)
+
+
+    def get_token_ids(self, text, vocabulary, **options):
+        """
+        Returns the tokens as two parallel arrays: the ids of the token strings
+        in vocabulary (int32, new tokens are added to the Vocabulary unless it
+        is frozen) and the codes of their labels (int8, see TAG_CODES). Options
+        are the same as for get_tokens.
+        """
+        ids = array('i')
+        tags = array('b')
+        for token, tag in self.iter_tokens(text, **options):
+            ids.append(vocabulary.add(token))
+            tags.append(TAG_CODES[tag])
+        return ids, tags
+
+
+    def get_token_variants(self, text, variants):
+        """
+        Returns the tokens of the text for several sets of options at once: a
+        list with one list of tokens per dict of options in variants (options
+        are the same as for get_tokens). The text is scanned only once per
+        lowercase option and emoticon replacement, the tokens of all variants
+        are derived from these base tokens.
+        """
+        texts = {}
+        base_tokens = {}
+        token_lists = []
+        for options in variants:
+            lowercase, stem, replace_emojis, replace_num, remove_stopw, \
+                remove_punct, addit_mode = _option_values(**options)
+            if lowercase not in texts:
+                variant_text = text.lower() if lowercase else text
+                texts[lowercase] = (variant_text, bool(_ANY_EMOTICON.search(variant_text)))
+            variant_text, has_emoticons = texts[lowercase]
+            mode = _emoticon_mode(replace_emojis, addit_mode) if has_emoticons else None
+            if (lowercase, mode) not in base_tokens:
+                base_tokens[lowercase, mode] = list(self.__scan_base(variant_text, mode))
+            token_lists.append(list(self.__derive(base_tokens[lowercase, mode], stem,
+                replace_emojis, replace_num, remove_stopw, remove_punct, addit_mode)))
+        return token_lists
+
+
+    def get_cache_info(self):
+        """
+        Returns hits, misses, maximum and current size of the token cache, or
+        None if caching is disabled.
+        """
+        return self.__cached_tokens.cache_info() if self.cache_size else None
+
+
+    def clear_cache(self):
+        if self.cache_size:
+            self.__cached_tokens.cache_clear()
+
+
+    def __immutable_tokens(self, text, *options):
+        return tuple(self.__tokenize(text, *options))
+
+
+    def __tokenize(self, text, *options):
+        return list(self.__generate_tokens(text, *options))
+
+
+    def __generate_tokens(self, text, lowercase, stem, replace_emojis,
+            replace_num, remove_stopw, remove_punct, addit_mode):
         # Convert to lowercase
         if lowercase:
             text = text.lower()
+        mode = _emoticon_mode(replace_emojis, addit_mode) \
+            if _ANY_EMOTICON.search(text) else None
+        return self.__derive(self.__scan_base(text, mode), stem, replace_emojis,
+            replace_num, remove_stopw, remove_punct, addit_mode)
+
 
+    def __scan_base(self, text, mode):
+        """
+        Scans the (lowercased) text into base tokens, which don't depend on any
+        options other than the replacement mode of emoticons (None if the text
+        has no emoticons). Besides final (token, label) tuples, these are
+        (emoji, 'emoji', emoji label) and (characters, None) for characters
+        that still need to be labeled by add_new_token.
+        """
         # Codify emoticons as tokens
-        for emoticon in emoticon_to_label.keys():
-            if re.search(emoticon, text):
-                if replace_emojis and addit_mode:
-                    # Replace with emoticon + label (eg ":-)" > "[#:-)#] joy")
-                    replace_by = '[#{}#] {}'.format(emoticon_to_label[emoticon][1:-1], emoticon)
-                elif replace_emojis:
-                    # Replace emoticon by label
-                    replace_by = '[#{}#]'.format(emoticon_to_label[emoticon][1:-1])
-                else:
-                    # Just format emoticon
-                    replace_by = '[#{}#]'.format(emoticon)
-                text = re.sub(emoticon, replace_by, text)
+        if mode:
+            text = self.__rewrite_emoticons(text, mode)
 
         # Replace newline symbols with whitespace
-        if re.search('[NEWLINE]', text):
-            text = re.sub('\[NEWLINE\]', ' ', text)
+        text = text.replace('[NEWLINE]', ' ')
+
+        return self.__lex(text) if self.lexer else self.__scan(text)
+
+
+    def __derive(self, base_tokens, stem, replace_emojis, replace_num,
+            remove_stopw, remove_punct, addit_mode):
+        """
+        Derives the tokens for the given options from base tokens (see
+        __scan_base).
+        """
+        stopwords = self.stopwords if remove_stopw else ()
+        for token in base_tokens:
+            tag = token[1]
+            if tag == 'word':
+                # Remove stopwords
+                if token[0].lower() not in stopwords:
+                    yield token
+            elif tag is None:
+                for new_token in self.add_new_token(token[0], replace_num, stem, addit_mode):
+                    if new_token[1] != 'word' or new_token[0].lower() not in stopwords:
+                        yield new_token
+            elif tag == 'emoji':
+                if replace_emojis:
+                    yield (token[2], 'emoji')
+                    if addit_mode:
+                        yield (token[0], 'emoji')
+                else:
+                    yield (token[0], 'emoji')
+            elif tag != 'punctuation' or not remove_punct:
+                yield token
+
+
+    def __scan(self, text):
 
         # Split string and analyze each token seperately
-        result = []
         tokens = text.split()
         for token in tokens:
 
             # Token is word
             if token.isalpha():
-                result.append((token, 'word'))
+                yield (token, 'word')
 
             # Token is special symbol, eg [#SYMBOL#]
             elif re.fullmatch('^\[#(.*)#\]$', token):
                 if token.lower() == '[#triggerword#]':
-                    result.append(('<TRIGGERWORD>', 'triggerword'))
+                    yield ('<TRIGGERWORD>', 'triggerword')
                 else:
                     # should be emoticon
-                    result.append((token[2:-2], 'emoticon'))
+                    yield (token[2:-2], 'emoticon')
 
             # Token is removed url
             elif token.lower() == 'http://url.removed':
-                result.append(('<URL>', 'url'))
+                yield ('<URL>', 'url')
 
             # Look for punctuation, emojis or whitespace
             else:
                 new_token = ''
-                for char in token:
+                i = 0
+                while i < len(token):
+                    char = token[i]
                     # Character is punctuation
                     if char in self.punct:
                         # add preceding charachters to results, if any
                         if new_token:
-                            result += self.add_new_token(new_token, replace_num, stem, addit_mode)
+                            yield (new_token, None)
                             new_token = ''
                         # Add symbol to result, except # and @
                         if char == '#' or char == '@':
                             new_token += char
-                        elif not remove_punct:
-                            result.append((char, 'punctuation'))
-                    # Character is common emoji
-                    elif char in emoji_to_label.keys():
+                        else:
+                            yield (char, 'punctuation')
+                        i += 1
+                        continue
+                    emoji_sequence, emoji_label, end = self.match_emoji(token, i)
+                    # Character (sequence) is emoji
+                    if emoji_sequence:
                         # add preceding charachters to results, if any
                         if new_token:
-                            result += self.add_new_token(new_token, replace_num, stem, addit_mode)
+                            yield (new_token, None)
                             new_token = ''
                         # add emoji to results
-                        if replace_emojis:
-                            emoji_text = emoji_to_label[char] # ignore columns
-                            result.append((emoji_text[1:-1], 'emoji'))
-                            if addit_mode:
-                                result.append((char, 'emoji'))
-                        else:
-                            result.append((char, 'emoji'))
-                    # Character is uncommon emoji
-                    elif char in emoji.UNICODE_EMOJI.keys():
+                        yield (emoji_sequence, 'emoji', emoji_label)
+                        i = end
+                    # Character is alpha-numerical
+                    else:
+                        new_token += char
+                        i += 1
+                # final check after loop
+                if new_token:
+                    yield (new_token, None)
+
+
+    def __lex(self, text):
+        """
+        Lexer backend, yields the same tokens as __scan. Words, special symbols
+        and urls are recognized by plain string tests instead of a regex per
+        token. Remaining tokens are scanned once by the master pattern, which
+        yields punctuation, possible emojis and whole runs of other characters
+        instead of single characters.
+        """
+
+        for token in text.split():
+            # Token is word
+            if token.isalpha():
+                yield (token, 'word')
+            # Token is special symbol, eg [#SYMBOL#]
+            elif token[:2] == '[#' and token[-2:] == '#]' and len(token) > 3:
+                if token.lower() == '[#triggerword#]':
+                    yield ('<TRIGGERWORD>', 'triggerword')
+                else:
+                    # should be emoticon
+                    yield (token[2:-2], 'emoticon')
+            # Token is removed url
+            elif len(token) == 18 and token.lower() == 'http://url.removed':
+                yield ('<URL>', 'url')
+            # Look for punctuation, emojis or whitespace, in pieces
+            else:
+                new_token = ''
+                i = 0
+                while i < len(token):
+                    piece = _LEXER.match(token, i)
+                    # Run of alpha-numerical characters
+                    if piece.lastgroup == 'run':
+                        new_token += piece.group()
+                        i = piece.end()
+                        continue
+                    char = token[i]
+                    # Character is punctuation
+                    if piece.lastgroup == 'punct':
                         # add preceding charachters to results, if any
                         if new_token:
-                            result += self.add_new_token(new_token, replace_num, stem, addit_mode)
+                            yield (new_token, None)
                             new_token = ''
-                        # add emoji
-                        if replace_emojis:
-                            emoji_text = emoji.demojize(char) # ignore columns
-                            result.append((emoji_text[1:-1], 'emoji'))
-                            if addit_mode:
-                                result.append((char, 'emoji'))
+                        # Add symbol to result, except # and @
+                        if char == '#' or char == '@':
+                            new_token += char
                         else:
-                            result.append((char, 'emoji'))
-                    # Character is alpha-numerical
+                            yield (char, 'punctuation')
+                        i += 1
+                        continue
+                    emoji_sequence, emoji_label, end = self.match_emoji(token, i)
+                    # Character (sequence) is emoji
+                    if emoji_sequence:
+                        # add preceding charachters to results, if any
+                        if new_token:
+                            yield (new_token, None)
+                            new_token = ''
+                        # add emoji to results
+                        yield (emoji_sequence, 'emoji', emoji_label)
+                        i = end
+                    # Character only starts emojis, but is alpha-numerical here
                     else:
                         new_token += char
+                        i += 1
                 # final check after loop
                 if new_token:
-                    result += self.add_new_token(new_token, replace_num, stem, addit_mode)
-        # Remove stopwords
-        if remove_stopw:
-            result = self.remove_stopwords(result)
-        return result
+                    yield (new_token, None)
+
+
+    def __rewrite_emoticons(self, text, mode):
+        """
+        Rewrites emoticons as special symbols, eg "[#joy#]". The patterns are
+        applied in the order of the emoticon table, since later patterns can
+        match symbols inserted by earlier ones (eg ">:\\" inside "[#>:\\)+#]"),
+        skipping patterns whose required characters are not in the text.
+        """
+        chars = set(text)
+        for (pattern, required), replace_by in _EMOTICON_SUBSTITUTIONS[mode]:
+            if required <= chars:
+                text, n = pattern.subn(replace_by, text)
+                if n:
+                    chars = set(text)
+        return text
+
+
+    def match_emoji(self, token, start):
+        """
+        Returns the longest emoji sequence (eg with skin tone, ZWJ sequence or
+        flag) that begins at position start of the token, its label and the
+        position after it, or (None, None, start). Trailing variation selectors
+        are skipped but not part of the sequence, so eg "❤️" and "❤" are the
+        same emoji.
+        """
+        lengths = _EMOJI_SEQUENCE_LENGTHS.get(token[start])
+        if lengths:
+            for length in lengths:
+                sequence = token[start:start+length]
+                if sequence in _EMOJI_LABELS:
+                    label = _EMOJI_LABELS[sequence]
+                    end = start + length
+                    while token[end:end+1] == _VARIATION_SELECTOR:
+                        end += 1
+                    return sequence.rstrip(_VARIATION_SELECTOR), label, end
+        return None, None, start
 
 
     def add_new_token(self, token, replace_num, stem, addit):
@@ -156,7 +538,7 @@ class Tokenizer():
             new_tokens.append((token, 'username'))
         elif token.isalpha():
             if stem:
-                stemmed_token = self.stemmer.stem(token)
+                stemmed_token = _stem(token)
                 if stemmed_token and stemmed_token != token:
                     new_tokens.append((stemmed_token, 'word'))
                     if addit:
@@ -191,25 +573,52 @@ class Tokenizer():
             replace_emojis = False,
             replace_num = False,
             remove_stopw = False,
-            remove_punct = False ):
+            remove_punct = False,
+            addit_mode = True ):
 
-        tokens = self.get_tokens(text, lowercase, stem, replace_emojis,
-            replace_num, remove_stopw, remove_punct)
+        tokens = self.iter_tokens(text, lowercase, stem, replace_emojis,
+            replace_num, remove_stopw, remove_punct, addit_mode)
 
-        unique_tokens = []  # list of strings
-        terms = []  # list of tuples
+        terms = {}  # token string --> first tuple, in order of occurrence
         for token in tokens:
-            if token[0] not in unique_tokens:
-                unique_tokens.append(token[0])
-                terms.append(token)
-        return terms
+            if token[0] not in terms:
+                terms[token[0]] = token
+        return list(terms.values())
+
+
+    def get_tokens_batch(self, texts, workers:int=None, chunksize:int=1000,
+            **options):
+        """
+        Returns a list with the tokens of each text, in the same order as the
+        texts. Texts are tokenized in chunks by a pool of worker processes (by
+        default one per CPU). Options are the same as for get_tokens.
+        """
+        return list(self.iter_tokens_batch(texts, workers, chunksize, **options))
+
+
+    def iter_tokens_batch(self, texts, workers:int=None, chunksize:int=1000,
+            **options):
+        """
+        Generator version of get_tokens_batch, yields the tokens of each text
+        as soon as its chunk is tokenized. Texts can be any iterable, so very
+        large inputs don't need to be held in memory as a list.
+        """
+        if workers == 1:
+            for text in texts:
+                yield self.get_tokens(text, **options)
+            return
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, chunksize)), [])
+        with Pool(workers, _init_worker, (self.cache_size, self.lexer)) as pool:
+            for tokens in pool.imap(_tokenize_chunk, ((chunk, options) for chunk in chunks)):
+                yield from tokens
 
 
     def get_stems(self, tokens):
         stemmed_tokens = []
         for token in tokens:
             if token[1] == 'word':
-                new_token = self.stemmer.stem(token[0])
+                new_token = _stem(token[0])
                 if new_token:
                     stemmed_tokens.append((new_token, 'word'))
                 else:
@@ -219,16 +628,46 @@ class Tokenizer():
         return stemmed_tokens
 
 
+    def get_stems_batch(self, token_lists):
+        """
+        Same as get_stems for a list of token lists (eg a whole corpus), but
+        each unique word is stemmed only once and the stems are mapped back
+        to all its occurrences.
+        """
+        words = {token[0] for tokens in token_lists for token in tokens \
+            if token[1] == 'word'}
+        stems = {word: _stem(word) or word for word in words}
+        return [[(stems[token[0]], 'word') if token[1] == 'word' else token \
+            for token in tokens] for tokens in token_lists]
+
+
+# Tokenizer of a worker process, see Tokenizer.iter_tokens_batch
+_worker_tokenizer = None
+
+def _init_worker(cache_size, lexer):
+    global _worker_tokenizer
+    _worker_tokenizer = Tokenizer(cache_size, lexer)
+
+def _tokenize_chunk(chunk_and_options):
+    chunk, options = chunk_and_options
+    return [_worker_tokenizer.get_tokens(text, **options) for text in chunk]
+
+
+# Example tweets, also used in tokenizer_test
+examples = [
+    'HeLlO\t,  WoRld! I\'m Tired of lo/sers <33333 1984 :)))) [NEWLINE] >:\\ 🤠 🙂 😃😄😆😍',
+    "much♡[NEWLINE]•2 … …texting&driving he's @USERNAME works. A[NEWLINE][NEWLINE]As Mom:\"its pretty done.",
+    '#WeLoveYouJackson[NEWLINE]#ItsOnlyGOT7',
+    '#Love#Love @user',
+    '’…”“£—＠→♡°⁎«＼｜／',
+    'fu*kers',
+    ]
+
+
 if __name__ == '__main__':
 
     tokenizer = Tokenizer()
-    test_1 = 'HeLlO\t,  WoRld! I\'m Tired of lo/sers <33333 1984 :)))) [NEWLINE] >:\ 🤠 🙂 😃😄😆😍'
-    test_2 = "much♡[NEWLINE]•2 … …texting&driving he's @USERNAME works. A[NEWLINE][NEWLINE]As Mom:\"its pretty done."
-    test_3 = '#WeLoveYouJackson[NEWLINE]#ItsOnlyGOT7'
-    test_4 = '#Love#Love @user'
-    test_5 = '’…”“£—＠→♡°⁎«＼｜／'
-    test_6 = 'fu*kers'
-    choice = test_1
+    choice = examples[0]
     tokens = tokenizer.get_tokens(choice,
                 lowercase=False,
                 stem=True,
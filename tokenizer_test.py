@@ -0,0 +1,88 @@
+"""
+Parity test of the two tokenizer backends: the lexer (Tokenizer(lexer=True))
+must give exactly the same tokens as the default backend. Tokens derived by
+get_token_variants must be the same as tokens of get_tokens. Run with pytest or
+as a script from the root folder of the repository.
+"""
+
+import random
+from itertools import product
+
+from tokenizer import Tokenizer, examples
+from utils.translate_emoji import emoji_to_label
+
+options = ['lowercase', 'stem', 'replace_emojis', 'replace_num', 'remove_stopw',
+    'remove_punct', 'addit_mode']
+
+# Building blocks of generated tweets
+words = ['Hello', 'WoRld!', "I'm", 'running', 'the', 'DOGS', 'lo/sers',
+    'fu*kers', '1984', '3rd', '½', '²', 'Ⅻ', 'café', '#Love#Love', '@user',
+    'http://url.removed', 'HTTP://URL.REMOVED', '[#TRIGGERWORD#]', '[#]',
+    '[##]', '[NEWLINE]', 'much♡', '•2', '…texting&driving', 'Mom:"its',
+    '’…”“£—＠→♡°⁎«＼｜／']
+emoticons = [':)', ':))))', '>:)', '>:\\', ':D', '=d', '<333', '</3', ":')",
+    ';-)', 'D:', ':P', '-__-', '>.<', '^_^', ':*', 'O_O', 'X)', '\\O/', '0:)']
+emojis = list(emoji_to_label)[:20] + ['🤠', '✨', '👍🏽', '👨‍👩‍👧', '🇩🇪',
+    '❤️', '🏳️‍🌈', '1️⃣', '🇩']
+separators = [' ', ' ', '', '\t', '  ', '\u3000']
+
+
+def generate_tweets(number=500, seed=0):
+    """ Returns a list of random tweets made of the building blocks above. """
+    generator = random.Random(seed)
+    blocks = words + emoticons + emojis
+    tweets = []
+    for _ in range(number):
+        parts = [generator.choice(blocks) for _ in range(generator.randint(1, 15))]
+        tweets.append(''.join(part + generator.choice(separators) for part in parts))
+    return tweets
+
+
+def assert_same_tokens(tweets, all_options=True):
+    default = Tokenizer()
+    lexer = Tokenizer(lexer=True)
+    combinations = list(product([False, True], repeat=len(options)))
+    for i, tweet in enumerate(tweets):
+        # Test every 7th combination of options for the generated tweets
+        for values in (combinations if all_options else combinations[i % 7::7]):
+            kwargs = dict(zip(options, values))
+            assert default.get_tokens(tweet, **kwargs) == lexer.get_tokens(tweet, **kwargs), \
+                'Different tokens for "{}" with {}'.format(tweet, kwargs)
+
+
+def assert_same_variants(tweets):
+    tokenizer = Tokenizer()
+    variants = [dict(zip(options, values))
+        for values in product([False, True], repeat=len(options))]
+    for tweet in tweets:
+        token_lists = tokenizer.get_token_variants(tweet, variants)
+        for kwargs, tokens in zip(variants, token_lists):
+            assert tokens == tokenizer.get_tokens(tweet, **kwargs), \
+                'Different variant tokens for "{}" with {}'.format(tweet, kwargs)
+
+
+def test_examples():
+    assert_same_tokens(examples)
+
+
+def test_generated_tweets():
+    assert_same_tokens(generate_tweets(), all_options=False)
+
+
+def test_token_variants():
+    assert_same_variants(examples + generate_tweets(100))
+
+
+def test_variation_selector():
+    # Emojis with and without trailing U+FE0F are the same token
+    for tokenizer in (Tokenizer(), Tokenizer(lexer=True)):
+        assert tokenizer.get_tokens('I \u2764\ufe0f you \u263a\ufe0f\ufe0f') \
+            == tokenizer.get_tokens('I \u2764 you \u263a')
+
+
+if __name__ == '__main__':
+    test_examples()
+    test_generated_tweets()
+    test_token_variants()
+    test_variation_selector()
+    print('Both tokenizer backends give the same tokens.')
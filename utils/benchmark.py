@@ -0,0 +1,41 @@
+"""
+Micro-benchmarks for the tokenizer. Run from the root folder of the repository:
+
+    python -m utils.benchmark
+"""
+
+from timeit import timeit
+
+from tokenizer import Tokenizer
+
+
+tweets = [
+    'HeLlO\t,  WoRld! I\'m Tired of lo/sers <33333 1984 :)))) [NEWLINE] >:\\ 🤠 🙂 😃😄😆😍',
+    "much♡[NEWLINE]•2 … …texting&driving he's @USERNAME works. A[NEWLINE][NEWLINE]As Mom:\"its pretty done.",
+    '#WeLoveYouJackson[NEWLINE]#ItsOnlyGOT7',
+    'I spent 24 hours with my boyfriend yet I was still [#TRIGGERWORD#] when he dropped me off',
+    ]
+
+
+def time_per_tweet(function, number=2000):
+    """ Returns the average runtime of function per tweet in microseconds. """
+    seconds = timeit(lambda: [function(tweet) for tweet in tweets], number=number)
+    return seconds * 1e6 / (number * len(tweets))
+
+
+def benchmark_construction():
+    """
+    Compares tokenizing with a new Tokenizer per tweet (as Featurer used to do)
+    with one shared Tokenizer.
+    """
+    shared = Tokenizer()
+    construction = time_per_tweet(lambda tweet: Tokenizer())
+    per_tweet = time_per_tweet(lambda tweet: Tokenizer().get_tokens(tweet))
+    reused = time_per_tweet(lambda tweet: shared.get_tokens(tweet))
+    print('Tokenizer construction:\t{:.1f} µs'.format(construction))
+    print('New tokenizer per tweet:\t{:.1f} µs per tweet'.format(per_tweet))
+    print('Shared tokenizer:\t{:.1f} µs per tweet'.format(reused))
+
+
+if __name__ == '__main__':
+    benchmark_construction()
@@ -0,0 +1,89 @@
+from array import array
+
+class Vocabulary(object):
+    """ A datastructure to map tokens (strings) to integer ids and back.
+
+        Each token string is stored once, so tokens can be passed around as
+        compact arrays of ids. Ids are given in order of insertion, id 0 is
+        reserved for unknown tokens. A growable vocabulary adds each new token,
+        a frozen vocabulary maps unseen tokens to the unknown id.
+    """
+
+    def __init__(self, tokens=None, frozen:bool=False, unknown:str='<UNK>'):
+        """ Inits the Vocabulary.
+
+            Args:
+                (optional) tokens: iterable of token strings to add.
+                (optional) frozen: if True, no tokens can be added later on.
+                (optional) unknown: the token string for unknown tokens.
+        """
+        self.__ids = {}
+        self.__tokens = []
+        self.__frozen = False
+        self.unknown_id = self.add(unknown)
+        if tokens:
+            for token in tokens:
+                self.add(token)
+        self.__frozen = frozen
+
+
+    def __len__(self):
+        return len(self.__tokens)
+
+
+    def __contains__(self, token):
+        return token in self.__ids
+
+
+    def __iter__(self):
+        return iter(self.__tokens)
+
+
+    def add(self, token:str):
+        """ Adds the token if it is new and the vocabulary is not frozen.
+
+            Returns:
+                The id of the token (the unknown id if frozen and unseen).
+        """
+        token_id = self.__ids.get(token)
+        if token_id is None:
+            if self.__frozen:
+                return self.unknown_id
+            token_id = len(self.__tokens)
+            self.__ids[token] = token_id
+            self.__tokens.append(token)
+        return token_id
+
+
+    def get_id(self, token:str):
+        """ Returns the id of the token, or the unknown id for unseen tokens. """
+        return self.__ids.get(token, self.unknown_id)
+
+
+    def get_ids(self, tokens):
+        """ Returns the ids of the tokens (strings) as array of int32. New
+            tokens are added, unless the vocabulary is frozen.
+        """
+        ids = self.__ids
+        return array('i', [ids[token] if token in ids else self.add(token)
+            for token in tokens])
+
+
+    def get_token(self, token_id:int):
+        """ Returns the token string of the id. """
+        return self.__tokens[token_id]
+
+
+    def get_tokens(self, token_ids):
+        """ Returns a list with the token strings of the ids. """
+        tokens = self.__tokens
+        return [tokens[i] for i in token_ids]
+
+
+    def freeze(self):
+        """ Stops adding new tokens, unseen tokens get the unknown id. """
+        self.__frozen = True
+
+
+    def is_frozen(self):
+        return self.__frozen